@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/saneyaml/ for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import argparse
+from functools import partial
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import yaml
+
+import saneyaml
+
+import corpus_generator
+
+try:  # pragma: nocover
+    import resource
+except ImportError:  # pragma: nocover
+    resource = None
+
+"""
+Benchmarks of load, load with duplicate keys checks, dump and load/dump round
+trips over the test YAML files and over a larger synthetic corpus from the
+corpus generator.
+
+Each benchmark runs in its own process to report its peak RSS together with
+its throughput in documents per second and in MB of YAML per second. The
+results are compared with a stored baseline and a benchmark is reported as a
+regression when its throughput drops or its peak RSS grows by more than a
+threshold ratio. The exit code is 1 if there are any regressions.
+
+Baselines depend on the machine, the Python and PyYAML versions and the
+availability of libyaml: save a new baseline on the machine used to compare.
+
+Run with: python benchmarks/bench_saneyaml.py
+Save a new baseline with: python benchmarks/bench_saneyaml.py --save-baseline
+"""
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+test_data_dir = os.path.join(bench_dir, os.pardir, 'tests', 'data', 'yamls')
+default_baseline = os.path.join(bench_dir, 'baseline.json')
+
+# ratio of throughput drop or peak RSS growth reported as a regression
+DEFAULT_THRESHOLD = 0.25
+
+
+def get_test_data_corpus(location=test_data_dir):
+    """
+    Return a list of the YAML texts of the test YAML files found in the
+    `location` directory that load without duplicated keys.
+    """
+    texts = []
+    for name in sorted(os.listdir(location)):
+        if not name.endswith('.yml'):
+            continue
+        with io.open(os.path.join(location, name), encoding='utf-8') as inp:
+            text = inp.read()
+        try:
+            saneyaml.load(text, allow_duplicate_keys=False)
+        except yaml.YAMLError:
+            continue
+        texts.append(text)
+    return texts
+
+
+corpora = {
+    'data': get_test_data_corpus,
+    'synthetic': partial(corpus_generator.generate_corpus, count=100),
+}
+
+
+def load(texts):
+    for text in texts:
+        saneyaml.load(text)
+
+
+def load_dupe_check(texts):
+    for text in texts:
+        saneyaml.load(text, allow_duplicate_keys=False)
+
+
+def dump(objs):
+    for obj in objs:
+        saneyaml.dump(obj)
+
+
+def round_trip(texts):
+    for text in texts:
+        saneyaml.dump(saneyaml.load(text))
+
+
+# {name: (function, run on loaded objects)}
+operations = {
+    'load': (load, False),
+    'load_dupe_check': (load_dupe_check, False),
+    'dump': (dump, True),
+    'round_trip': (round_trip, False),
+}
+
+
+def get_benchmark_names():
+    return ['{}.{}'.format(op, corpus) for corpus in corpora for op in operations]
+
+
+def get_peak_rss():
+    """
+    Return the peak resident set size in bytes of the current process or None.
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux and bytes on macOS
+    if sys.platform != 'darwin':
+        peak_rss *= 1024
+    return peak_rss
+
+
+def timed(function, items, number):
+    """
+    Return the time in seconds to run `function` `number` times on `items`.
+    """
+    start = time.perf_counter()
+    for _ in range(number):
+        function(items)
+    return time.perf_counter() - start
+
+
+def run_benchmark(name, repeat=5, min_time=0.2):
+    """
+    Return a mapping of results for running the `name` benchmark in the
+    current process, keeping the best of `repeat` runs. Each run repeats the
+    benchmark on the whole corpus for at least `min_time` seconds.
+    """
+    op, _, corpus = name.partition('.')
+    function, on_objects = operations[op]
+    texts = corpora[corpus]()
+    size = sum(len(text.encode('utf-8')) for text in texts)
+    items = [saneyaml.load(text) for text in texts] if on_objects else texts
+
+    number = 1
+    while timed(function, items, number) < min_time:
+        number *= 2
+
+    best = min(timed(function, items, number) for _ in range(repeat))
+    return dict(
+        ops_per_sec=len(items) * number / best,
+        mb_per_sec=size * number / best / 1e6,
+        peak_rss=get_peak_rss(),
+    )
+
+
+def run_in_process(name, repeat):
+    """
+    Return a mapping of results for running the `name` benchmark in a new
+    process.
+    """
+    output = subprocess.check_output([
+        sys.executable, os.path.abspath(__file__),
+        '--run', name, '--repeat', str(repeat),
+    ])
+    return json.loads(output)
+
+
+def get_environment():
+    return dict(
+        python=platform.python_version(),
+        pyyaml=yaml.__version__,
+        libyaml=saneyaml.CParser is not None,
+        platform=platform.platform(),
+    )
+
+
+def compare(name, result, baseline, threshold):
+    """
+    Return a list of regression messages for a `name` benchmark `result`
+    compared with its `baseline` result.
+    """
+    regressions = []
+    ops_ratio = result['ops_per_sec'] / baseline['ops_per_sec']
+    if ops_ratio < 1 - threshold:
+        regressions.append('{}: throughput {:.0%} of baseline'.format(name, ops_ratio))
+
+    if result['peak_rss'] and baseline.get('peak_rss'):
+        rss_ratio = result['peak_rss'] / baseline['peak_rss']
+        if rss_ratio > 1 + threshold:
+            regressions.append('{}: peak RSS {:.0%} of baseline'.format(name, rss_ratio))
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark saneyaml load and dump.')
+    parser.add_argument('--baseline', default=default_baseline, help='baseline JSON file')
+    parser.add_argument(
+        '--save-baseline', action='store_true', help='save results as the baseline')
+    parser.add_argument(
+        '--threshold', type=float, default=DEFAULT_THRESHOLD, help='regression ratio')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of each benchmark')
+    parser.add_argument(
+        '--only', action='append', choices=get_benchmark_names(), help='benchmark to run')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+
+    if args.run:
+        print(json.dumps(run_benchmark(args.run, repeat=args.repeat)))
+        return 0
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with io.open(args.baseline, encoding='utf-8') as inp:
+            baseline = json.load(inp)
+        if baseline['environment'] != get_environment():
+            print('warning: baseline environment differs: {}'.format(baseline['environment']))
+
+    results = {}
+    regressions = []
+    print('{:32} {:>12} {:>10} {:>10} {:>10}'.format(
+        'benchmark', 'docs/s', 'MB/s', 'RSS MB', 'baseline'))
+    for name in args.only or get_benchmark_names():
+        result = results[name] = run_in_process(name, repeat=args.repeat)
+        peak_rss = result['peak_rss'] and result['peak_rss'] / 1e6 or 0
+        base = baseline and baseline['results'].get(name)
+        ratio = ''
+        if base:
+            ratio = '{:.0%}'.format(result['ops_per_sec'] / base['ops_per_sec'])
+            regressions.extend(compare(name, result, base, args.threshold))
+        print('{:32} {:12.1f} {:10.2f} {:10.1f} {:>10}'.format(
+            name, result['ops_per_sec'], result['mb_per_sec'], peak_rss, ratio))
+
+    if args.save_baseline:
+        with io.open(args.baseline, 'w', encoding='utf-8') as out:
+            baseline = dict(environment=get_environment(), results=results)
+            json.dump(baseline, out, indent=2, sort_keys=True)
+            out.write('\n')
+        print('saved baseline: {}'.format(args.baseline))
+
+    for regression in regressions:
+        print('REGRESSION: {}'.format(regression))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
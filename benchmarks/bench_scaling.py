@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/saneyaml/ for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import argparse
+import math
+import sys
+import time
+import tracemalloc
+
+import saneyaml
+
+import corpus_generator
+
+try:  # pragma: nocover
+    from matplotlib import pyplot
+except ImportError:  # pragma: nocover
+    pyplot = None
+
+"""
+Scaling benchmark of load and dump time and memory versus the document size
+for documents of different shapes from the corpus generator: wide mappings,
+long lists, deep nesting and long texts. Each shape size is doubled at each
+step.
+
+For each shape, the scaling exponent of time and memory versus the YAML size
+is computed between the smallest and largest documents: it is about 1 for a
+linear behaviour and each shape with an exponent above a threshold is reported
+as non-linear. The exit code is 1 if there are any non-linear shapes.
+
+The load and dump time per KB of YAML are plotted as text, and the time and
+memory versus size to an image with --plot if matplotlib is installed.
+
+Run with: python benchmarks/bench_scaling.py
+"""
+
+# {shape: (smallest size, number of doublings)}
+SIZES = {
+    'wide_mapping': (250, 5),
+    'long_list': (250, 5),
+    'deep_nesting': (10, 4),
+    'long_text': (1000, 5),
+}
+
+# scaling exponent above which a shape is reported as non-linear
+DEFAULT_MAX_EXPONENT = 1.3
+
+
+def measure(function, arg, repeat):
+    """
+    Return a tuple of (best time in seconds, peak traced memory in bytes) to
+    run `function` with `arg`.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(arg)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+
+    tracemalloc.start()
+    try:
+        function(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_shape(shape, scale=1, repeat=2):
+    """
+    Return a list of (size, YAML bytes, load time, load peak memory, dump time,
+    dump peak memory) for each size of a `shape`, with sizes multiplied by a
+    `scale` factor.
+    """
+    make_document = corpus_generator.shapes[shape]
+    smallest, doublings = SIZES[shape]
+    results = []
+    for step in range(doublings):
+        size = int(smallest * scale) * 2 ** step
+        doc = make_document(size)
+        text = saneyaml.dump(doc)
+        load_time, load_peak = measure(saneyaml.load, text, repeat)
+        dump_time, dump_peak = measure(saneyaml.dump, doc, repeat)
+        nbytes = len(text.encode('utf-8'))
+        results.append((size, nbytes, load_time, load_peak, dump_time, dump_peak))
+    return results
+
+
+def get_exponent(first_size, first_value, last_size, last_value):
+    """
+    Return the scaling exponent of a value between two sizes.
+    """
+    if first_value <= 0 or last_value <= 0 or first_size == last_size:
+        return 0.0
+    return math.log(last_value / first_value) / math.log(last_size / first_size)
+
+
+def text_plot(label, sizes, values, width=40):
+    """
+    Print a text bar chart of `values` per KB for each of `sizes` in bytes.
+    Bars of a linear behaviour have about the same length.
+    """
+    per_kb = [value / (size / 1024) for size, value in zip(sizes, values)]
+    top = max(per_kb) or 1
+    print('  {} per KB'.format(label))
+    for size, value in zip(sizes, per_kb):
+        bar = '#' * max(1, int(width * value / top))
+        print('  {:>10.0f} KB {:<{width}} {:.3g}'.format(size / 1024, bar, value, width=width))
+
+
+def image_plot(all_results, location):
+    """
+    Write to `location` an image plotting load and dump time and memory
+    versus YAML size for each shape of `all_results`.
+    """
+    figure, axes = pyplot.subplots(1, 2, figsize=(12, 5))
+    for shape, results in all_results.items():
+        sizes = [r[1] / 1e6 for r in results]
+        axes[0].loglog(sizes, [r[2] for r in results], marker='o', label=shape + ' load')
+        axes[0].loglog(sizes, [r[4] for r in results], marker='x', label=shape + ' dump')
+        axes[1].loglog(sizes, [r[3] / 1e6 for r in results], marker='o', label=shape + ' load')
+        axes[1].loglog(sizes, [r[5] / 1e6 for r in results], marker='x', label=shape + ' dump')
+    axes[0].set(xlabel='YAML MB', ylabel='seconds', title='time')
+    axes[1].set(xlabel='YAML MB', ylabel='peak MB', title='memory')
+    axes[0].legend(fontsize='small')
+    figure.savefig(location)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark saneyaml scaling.')
+    parser.add_argument('--scale', type=float, default=1, help='multiply all sizes')
+    parser.add_argument('--repeat', type=int, default=2, help='timed runs of each size')
+    parser.add_argument('--max-exponent', type=float, default=DEFAULT_MAX_EXPONENT)
+    parser.add_argument('--only', action='append', choices=list(SIZES), help='shape to run')
+    parser.add_argument('--plot', help='write a plot image to this file')
+    args = parser.parse_args(args)
+
+    all_results = {}
+    non_linear = []
+    for shape in args.only or list(SIZES):
+        results = all_results[shape] = run_shape(shape, scale=args.scale, repeat=args.repeat)
+        print(shape)
+        print('  {:>8} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+            'size', 'KB', 'load s', 'load MB', 'dump s', 'dump MB'))
+        for size, nbytes, load_time, load_peak, dump_time, dump_peak in results:
+            print('  {:8d} {:10.1f} {:10.4f} {:10.2f} {:10.4f} {:10.2f}'.format(
+                size, nbytes / 1024, load_time, load_peak / 1e6, dump_time, dump_peak / 1e6))
+
+        first, last = results[0], results[-1]
+        labels = (2, 'load time'), (3, 'load memory'), (4, 'dump time'), (5, 'dump memory')
+        for index, label in labels:
+            exponent = get_exponent(first[1], first[index], last[1], last[index])
+            flag = ''
+            if exponent > args.max_exponent:
+                flag = ' NON-LINEAR'
+                non_linear.append('{} {}'.format(shape, label))
+            print('  {} exponent: {:.2f}{}'.format(label, exponent, flag))
+
+        sizes = [r[1] for r in results]
+        text_plot('load seconds', sizes, [r[2] for r in results])
+        text_plot('dump seconds', sizes, [r[4] for r in results])
+
+    if args.plot:
+        if pyplot is None:
+            print('matplotlib is not installed: cannot write plot to {}'.format(args.plot))
+        else:
+            image_plot(all_results, args.plot)
+
+    for shape in non_linear:
+        print('NON-LINEAR: {}'.format(shape))
+    return 1 if non_linear else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
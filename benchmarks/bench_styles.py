@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/saneyaml/ for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import io
+import os
+import timeit
+
+import saneyaml
+
+"""
+Micro-benchmark of the scalar style classification used when dumping, using
+all the keys and values of the test YAML files.
+
+Run with: python benchmarks/bench_styles.py
+"""
+
+test_data_dir = os.path.join(os.path.dirname(__file__), os.pardir, 'tests', 'data', 'yamls')
+
+
+def get_chained_style(value, default=None):
+    """
+    Return the YAML scalar style to use to dump the `value` string using the
+    chained checks that were used before the single regex classifier. This is
+    used as a reference.
+    """
+    style = default
+    if value.isdigit():
+        if value.lstrip('0') == value:
+            style = ''
+        else:
+            style = "'"
+
+    if saneyaml.is_iso_date(value):
+        style = "'"
+
+    if value != '.' and len(value.split('.')) == 2 and all(c in '0123456789.' for c in value):
+        style = "'"
+    elif value == 'null':
+        style = "'"
+    elif '\n' in value:
+        style = '|'
+
+    return style
+
+
+def get_scalars(location=test_data_dir):
+    """
+    Return a list of all the keys and scalar values of the YAML files found
+    in the `location` directory.
+    """
+    scalars = []
+
+    def collect(obj):
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                scalars.append(key)
+                collect(value)
+        elif isinstance(obj, list):
+            for value in obj:
+                collect(value)
+        else:
+            scalars.append(obj)
+
+    for name in sorted(os.listdir(location)):
+        if name.endswith('.yml'):
+            with io.open(os.path.join(location, name), encoding='utf-8') as inp:
+                collect(saneyaml.load(inp.read()))
+
+    return [s for s in scalars if isinstance(s, str)]
+
+
+def bench(function, scalars, number=200, repeat=5):
+    """
+    Return the best time in nanoseconds per scalar to run `function` on all
+    `scalars`.
+    """
+    timings = timeit.repeat(
+        lambda: [function(s) for s in scalars],
+        number=number,
+        repeat=repeat,
+    )
+    return min(timings) * 1e9 / (number * len(scalars))
+
+
+def main():
+    scalars = get_scalars()
+    for scalar in scalars:
+        assert saneyaml.get_style(scalar) == get_chained_style(scalar), scalar
+
+    chained = bench(get_chained_style, scalars)
+    single = bench(saneyaml.get_style, scalars)
+    print('scalars: {}'.format(len(scalars)))
+    print('chained checks:   {:8.1f} ns/scalar'.format(chained))
+    print('single classifier:{:8.1f} ns/scalar'.format(single))
+    print('speedup:          {:8.2f}x'.format(chained / single))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/saneyaml/ for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import argparse
+import io
+import os
+import random
+
+import saneyaml
+
+"""
+Deterministic generator of synthetic YAML documents and corpora with a
+controllable shape: the number of keys of each mapping, the nesting depth, the
+length of lists and the mix of scalars, including the dates, version-like
+floats, leading-zero numbers, multi-line license texts and unicode strings
+that saneyaml quotes or folds in special ways.
+
+The same arguments and seed always generate the same documents.
+
+Run with: python benchmarks/corpus_generator.py --count 100 <output directory>
+"""
+
+WORDS = (
+    'license', 'copyright', 'permission', 'software', 'notice', 'granted',
+    'free', 'charge', 'person', 'obtaining', 'copy', 'warranty', 'merchantability',
+    'fitness', 'purpose', 'liability', 'contract', 'tort', 'holders', 'source',
+)
+
+UNICODE_WORDS = (
+    'café', 'naïve', 'Ørsted', 'Straße', 'Ελληνικά', 'Кириллица', '中文',
+    '日本語', '한국어', 'العربية', '☃', '✓', 'ﬁ', ' ',
+)
+
+# default {scalar kind: weight} mix of generated scalars
+DEFAULT_MIX = {
+    'word': 6,
+    'sentence': 6,
+    'url': 2,
+    'date': 1,
+    'version': 1,
+    'leading_zero': 1,
+    'number': 1,
+    'boolean': 1,
+    'null': 1,
+    'unicode': 1,
+    'text': 1,
+}
+
+
+class CorpusGenerator(object):
+    """
+    Generate synthetic documents of nested mappings of `keys` keys up to a
+    `depth` nesting level with lists of `list_length` items. Scalars are picked
+    from a `mix` mapping of {scalar kind: weight} (see DEFAULT_MIX) and
+    multi-line texts have up to `text_lines` lines. The random generator is
+    seeded with `seed`.
+    """
+
+    def __init__(self, seed=0, keys=8, depth=3, list_length=4, mix=None, text_lines=20):
+        self.random = random.Random(seed)
+        self.keys = keys
+        self.depth = depth
+        self.list_length = list_length
+        self.text_lines = text_lines
+        mix = mix or DEFAULT_MIX
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+
+    def sentence(self, size=None):
+        rnd = self.random
+        size = size or rnd.randint(3, 12)
+        return ' '.join(rnd.choice(WORDS) for _ in range(size))
+
+    def text(self, lines=None):
+        lines = lines or self.random.randint(1, self.text_lines)
+        return '\n'.join(self.sentence() for _ in range(lines)) + '\n'
+
+    def scalar(self):
+        """
+        Return a random scalar picked from the scalar kinds mix.
+        """
+        rnd = self.random
+        kind = rnd.choices(self.kinds, self.weights)[0]
+        if kind == 'word':
+            return rnd.choice(WORDS)
+        if kind == 'sentence':
+            return self.sentence()
+        if kind == 'url':
+            return 'https://example.com/{}/{}'.format(rnd.choice(WORDS), rnd.randint(0, 10000))
+        if kind == 'date':
+            return '{:04d}-{:02d}-{:02d}'.format(
+                rnd.randint(1990, 2030), rnd.randint(1, 12), rnd.randint(1, 28))
+        if kind == 'version':
+            return '{}.{}'.format(rnd.randint(0, 9), rnd.choice(['0', '1', '10', '20', '200']))
+        if kind == 'leading_zero':
+            return '0{}'.format(rnd.randint(0, 999))
+        if kind == 'number':
+            return rnd.randint(0, 100000)
+        if kind == 'boolean':
+            return rnd.choice([True, False])
+        if kind == 'null':
+            return None
+        if kind == 'unicode':
+            return ' '.join(rnd.choice(UNICODE_WORDS) for _ in range(rnd.randint(1, 6)))
+        if kind == 'text':
+            return self.text()
+        raise ValueError('Unknown scalar kind: {}'.format(kind))
+
+    def key(self, index):
+        return '{}_{}'.format(self.random.choice(WORDS), index)
+
+    def mapping(self, depth=0):
+        """
+        Return a mapping nested up to `depth` levels below the generator depth.
+        """
+        rnd = self.random
+        nested = depth < self.depth
+        mapping = {}
+        for index in range(self.keys):
+            key = self.key(index)
+            choice = rnd.random() if nested else 0
+            if choice < 0.6:
+                mapping[key] = self.scalar()
+            elif choice < 0.8:
+                mapping[key] = self.mapping(depth + 1)
+            else:
+                mapping[key] = self.sequence(depth + 1)
+        return mapping
+
+    def sequence(self, depth=0):
+        """
+        Return a list of scalars or of mappings nested up to `depth` levels
+        below the generator depth.
+        """
+        if depth < self.depth and self.random.random() < 0.5:
+            return [self.mapping(depth + 1) for _ in range(self.list_length)]
+        return [self.scalar() for _ in range(self.list_length)]
+
+    def document(self):
+        """
+        Return a document mapping.
+        """
+        return self.mapping()
+
+    def documents(self, count):
+        """
+        Return a list of `count` document mappings.
+        """
+        return [self.document() for _ in range(count)]
+
+
+def wide_mapping(size, seed=0):
+    """
+    Return a flat mapping document with `size` keys.
+    """
+    return CorpusGenerator(seed=seed, keys=size, depth=0).document()
+
+
+def long_list(size, seed=0):
+    """
+    Return a document with a list of `size` small mappings.
+    """
+    generator = CorpusGenerator(seed=seed, keys=3, depth=0)
+    return {'items': [generator.document() for _ in range(size)]}
+
+
+def deep_nesting(size, seed=0):
+    """
+    Return a document of mappings and lists nested `size` levels deep.
+    """
+    generator = CorpusGenerator(seed=seed, keys=2, depth=0)
+    doc = generator.document()
+    for level in range(size):
+        if level % 2:
+            doc = [generator.scalar(), doc]
+        else:
+            doc = {generator.key(0): generator.scalar(), 'nested': doc}
+    return doc if isinstance(doc, dict) else {'nested': doc}
+
+
+def long_text(size, seed=0):
+    """
+    Return a document with a multi-line license text of `size` lines.
+    """
+    generator = CorpusGenerator(seed=seed)
+    return {'key': 'license', 'text': generator.text(lines=size)}
+
+
+# {shape name: function(size, seed) returning a document}
+shapes = {
+    'wide_mapping': wide_mapping,
+    'long_list': long_list,
+    'deep_nesting': deep_nesting,
+    'long_text': long_text,
+}
+
+
+def generate_corpus(count, seed=0, **kwargs):
+    """
+    Return a list of `count` dumped YAML texts of documents generated with a
+    CorpusGenerator from a `seed` and other CorpusGenerator `kwargs`.
+    """
+    generator = CorpusGenerator(seed=seed, **kwargs)
+    return [saneyaml.dump(doc) for doc in generator.documents(count)]
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic YAML corpus.')
+    parser.add_argument('output', help='output directory')
+    parser.add_argument('--count', type=int, default=100, help='number of documents')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keys', type=int, default=8, help='number of keys of each mapping')
+    parser.add_argument('--depth', type=int, default=3, help='nesting depth')
+    parser.add_argument('--list-length', type=int, default=4, help='number of list items')
+    parser.add_argument('--text-lines', type=int, default=20, help='maximum lines of texts')
+    args = parser.parse_args(args)
+
+    texts = generate_corpus(
+        count=args.count,
+        seed=args.seed,
+        keys=args.keys,
+        depth=args.depth,
+        list_length=args.list_length,
+        text_lines=args.text_lines,
+    )
+    os.makedirs(args.output, exist_ok=True)
+    for index, text in enumerate(texts):
+        location = os.path.join(args.output, '{:06d}.yml'.format(index))
+        with io.open(location, 'w', encoding='utf-8') as out:
+            out.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,20 +9,58 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+from collections import namedtuple
+from collections.abc import Mapping
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from functools import partial
+import codecs
+import fnmatch
+import hashlib
+import io
+import mmap
+import os
+import pickle
 import re
+import shutil
+import struct
+import time
+import uuid
 
 import yaml
+from yaml.constructor import SafeConstructor
+from yaml.error import MarkedYAMLError
 from yaml.error import YAMLError
+from yaml.events import AliasEvent
+from yaml.events import DocumentEndEvent
+from yaml.events import DocumentStartEvent
+from yaml.events import MappingEndEvent
+from yaml.events import MappingStartEvent
+from yaml.events import ScalarEvent
+from yaml.events import SequenceEndEvent
+from yaml.events import SequenceStartEvent
+from yaml.events import StreamEndEvent
 from yaml.emitter import Emitter
+from yaml.nodes import MappingNode
+from yaml.nodes import ScalarNode
+from yaml.nodes import SequenceNode
 from yaml.resolver import Resolver
 from yaml.representer import SafeRepresenter
 from yaml.serializer import Serializer
 
 try:  # pragma: nocover
     from yaml import CSafeLoader as SafeLoader
+    from yaml.cyaml import CParser
 except ImportError:  # pragma: nocover
     from yaml import SafeLoader
+    CParser = None
+
+try:  # pragma: nocover
+    from yaml.cyaml import CEmitter
+except ImportError:  # pragma: nocover
+    CEmitter = None
 
 """
 A wrapper around PyYAML to provide sane defaults ensuring that dump/load does
@@ -31,11 +69,31 @@ and use two spaces indents to get the most readable YAML and quotes or folds
 texts in a sane way.
 
 Use the `load` function to get a primitive type from a YAML string and the
-`dump` function to get a YAML string from a primitive type.
-Optionally check that there are no duplicated map keys when loading.
+`dump` function to get a YAML string from a primitive type. Use the `iter_load`
+function to get primitive types one at a time from a multi-documents YAML stream
+and the `dump_to` and `dump_all` functions to write YAML directly to a stream.
+Use the `dump_table` function to dump a large list of mappings with the same
+keys faster.
+Use the `load_file` and `dump_file` functions to load and dump YAML files and
+the `load_many`, `dump_many` and `dump_many_files` functions to load and dump
+many YAML strings or files in parallel. Use a `CachedLoader` to cache loaded
+YAML files on disk such that unchanged files are not parsed again and the
+`build_snapshot` and `open_snapshot` functions to pack a whole directory of YAML
+files in a single snapshot file.
+Optionally check that there are no duplicated map keys when loading, lazily
+construct the loaded mappings and lists when first accessed and intern the
+repeated keys and short values of many documents with an `InternTable`, share
+the equal mappings and lists of a document or load the lists of mappings with
+the same keys as compact columnar RecordTable. Use the `validate` function to
+report all the duplicated keys and other issues of a YAML stream without
+loading it.
 
 Load and dump rely on subclasses of SafeLoader and SafeDumper respectively
-doing all the dirty bidding to get PyYAML straight.
+doing all the dirty bidding to get PyYAML straight. Documents are loaded
+directly from the parser events when possible, without building a node graph
+first. When libyaml is available,
+dump uses a faster C emitter for the objects where its output is known to be
+identical to the pure Python emitter output.
 
 Note that since PyYAML does not have a consistent dump indent behaviou accross
 versions and Python vs C/libyaml, the tests may behave differently in some cases
@@ -47,19 +105,929 @@ and fail.
 ###############################################################################
 
 
-def load(s, allow_duplicate_keys=True):
+def load(
+    s,
+    allow_duplicate_keys=True,
+    lazy=False,
+    keys=None,
+    track_changes=False,
+    intern=None,
+    share_subtrees=False,
+    records=None,
+):
     """
     Return an object safely loaded from a YAML string `s`. `s` must be unicode
     or a string that converts to unicode without errors using an `utf-8` codec.
 
     If `allow_duplicate_keys` is False, a DuplicateYamlMappingKeyError Exception
     is raised if a mapping contains duplicated keys.
+
+    If `lazy` is True, mappings and lists are returned as read-only LazyMapping
+    and LazySequence that construct their values only when first accessed.
+    The document is parsed once without constructing it and each mapping or
+    list is parsed again from its own part of `s` when first accessed. Errors
+    such as duplicated keys are then raised on first access. Documents with
+    tags other than strings, booleans, mappings and lists, with tag directives
+    or with repeated anchors are loaded eagerly as plain dicts and lists.
+
+    If `keys` is provided, return a mapping of only these top-level keys and
+    their values, or the loaded object if it is not a mapping. Loading stops as
+    soon as all the `keys` are found and the values of other keys are skipped.
+    The rest of the document is then neither loaded nor checked for errors or
+    duplicated keys, and a top-level key repeated there is ignored. `keys` must
+    be an iterable of keys and not a string. This cannot be combined with
+    `lazy`.
+
+    If `track_changes` is True, mappings and lists are returned as TrackedDict
+    and TrackedList that record if the loaded document has been modified, such
+    that `dump_file` can skip writing an unchanged document back to the file it
+    was loaded from. This cannot be combined with `lazy` or `keys`.
+
+    If `intern` is True or an InternTable, mapping keys and short string values
+    are interned such that equal strings are returned as the same object. Pass
+    the same InternTable to many loads to share these strings across all the
+    loaded documents. This cannot be combined with `lazy`.
+
+    If `share_subtrees` is True, mappings and lists are returned as read-only
+    FrozenDict and FrozenList and all the equal mappings and lists of the
+    document are returned as the same shared object. This cannot be combined
+    with `lazy` or `track_changes`.
+
+    If `records` is 'columnar', each list of two or more mappings that all have
+    the same keys in the same order is returned as a read-only RecordTable
+    that stores its values by column and returns its items as read-only Record
+    mappings. Dumping a RecordTable gives the same YAML as the original list.
+    This cannot be combined with `lazy`, `track_changes` or `share_subtrees`.
+    """
+    if records is not None:
+        check_records(records)
+        if lazy or track_changes or share_subtrees:
+            raise ValueError(
+                'records cannot be combined with lazy, track_changes or share_subtrees')
+        data = load(s, allow_duplicate_keys=allow_duplicate_keys, keys=keys, intern=intern)
+        return get_records(data)
+
+    if share_subtrees:
+        if lazy or track_changes:
+            raise ValueError('share_subtrees cannot be combined with lazy or track_changes')
+        data = load(s, allow_duplicate_keys=allow_duplicate_keys, keys=keys, intern=intern)
+        return get_shared(data)
+
+    if track_changes:
+        if lazy or keys is not None:
+            raise ValueError('track_changes cannot be combined with lazy or keys')
+        if not isinstance(s, (str, bytes)):
+            s = s.read()
+        data = load(s, allow_duplicate_keys=allow_duplicate_keys, intern=intern)
+        return get_tracked(data, source=s)
+
+    loader = get_loader_class(allow_duplicate_keys)
+    intern_table = get_intern_table(intern)
+    if keys is not None:
+        check_keys(keys)
+        if lazy:
+            raise ValueError('keys cannot be combined with lazy')
+        if isinstance(s, (str, bytes)):
+            try:
+                return load_keys_from_events(s, loader, keys, intern_table)
+            except UnsupportedNodeError:
+                pass
+        return select_keys(load_from_nodes(s, loader, intern_table), keys)
+    if lazy:
+        if intern_table is not None:
+            raise ValueError('intern cannot be combined with lazy')
+        return load_lazy(s, loader)
+    if instruments:
+        return load_instrumented(s, loader, intern_table)
+    if isinstance(s, (str, bytes)):
+        try:
+            return load_from_events(s, loader, intern_table)
+        except UnsupportedNodeError:
+            pass
+    return load_from_nodes(s, loader, intern_table)
+
+
+def load_from_events(stream, loader_class, intern_table=None):
+    """
+    Return an object loaded from a single document YAML `stream` directly from
+    the parser events using a `loader_class` Loader class and an optional
+    `intern_table` InternTable. Raise an UnsupportedNodeError if the `stream`
+    should be loaded with `load_from_nodes`.
+    """
+    loader = loader_class(stream)
+    loader.intern_table = intern_table
+    try:
+        return loader.get_single_data_from_events()
+    finally:
+        loader.dispose()
+
+
+def load_from_nodes(stream, loader_class, intern_table=None):
+    """
+    Return an object loaded from a single document YAML `stream` from a
+    composed node graph using a `loader_class` Loader class and an optional
+    `intern_table` InternTable. This is the same as `yaml.load`.
+    """
+    loader = loader_class(stream)
+    loader.intern_table = intern_table
+    try:
+        return loader.get_single_data()
+    finally:
+        loader.dispose()
+
+
+def load_keys_from_events(stream, loader_class, keys, intern_table=None):
+    """
+    Return a mapping of the `keys` top-level keys and their values loaded from
+    a single document YAML `stream` directly from the parser events using a
+    `loader_class` Loader class and an optional `intern_table` InternTable.
+    Raise an UnsupportedNodeError if the `stream` should be loaded with
+    `load_from_nodes`.
+    """
+    loader = loader_class(stream)
+    loader.intern_table = intern_table
+    try:
+        return loader.get_keys_data_from_events(keys)
+    finally:
+        loader.dispose()
+
+
+def check_keys(keys):
+    """
+    Raise a ValueError if `keys` is a string rather than an iterable of keys.
+    """
+    if isinstance(keys, (str, bytes)):
+        raise ValueError('keys must be an iterable of keys, not a string: {!r}'.format(keys))
+
+
+def select_keys(data, keys):
+    """
+    Return a mapping of the `keys` top-level keys and their values from a `data`
+    loaded object or `data` as-is if this is not a mapping.
+    """
+    if not isinstance(data, dict):
+        return data
+    keys = frozenset(keys)
+    return {key: value for key, value in data.items() if key in keys}
+
+
+def load_lazy(stream, loader_class):
+    """
+    Return an object lazily loaded from a single document YAML `stream` using a
+    `loader_class` Loader class. Documents with tags, complex keys, anchors or
+    aliases that are not supported by the LazyConstructor are loaded eagerly.
+    """
+    if not isinstance(stream, (str, bytes)):
+        stream = stream.read()
+    if isinstance(stream, bytes):
+        stream = stream.decode('utf-8')
+    # the parser marks do not count a byte order mark
+    if stream.startswith('\ufeff'):
+        stream = stream[1:]
+    try:
+        return LazyConstructor(stream, loader_class).load()
+    except UnsupportedNodeError:
+        return load_from_nodes(stream, loader_class)
+
+
+def iter_load(stream, allow_duplicate_keys=True, intern=None):
+    """
+    Yield objects safely loaded one at a time from each of the documents of a
+    YAML `stream`. `stream` is either a string or a file object opened in text
+    or binary mode. File objects are read incrementally such that only one
+    document at a time is kept in memory.
+
+    If `allow_duplicate_keys` is False, a DuplicateYamlMappingKeyError Exception
+    is raised if a mapping contains duplicated keys.
+
+    If `intern` is True or an InternTable, mapping keys and short string values
+    are interned as with `load` using the same InternTable for all the
+    documents of the `stream`.
+    """
+    loader = get_loader_class(allow_duplicate_keys)
+    return load_all(stream, loader, get_intern_table(intern))
+
+
+def load_all(stream, loader_class, intern_table=None):
+    """
+    Yield objects loaded from each of the documents of a YAML `stream` using a
+    `loader_class` Loader class and an optional `intern_table` InternTable.
+    This is the same as `yaml.load_all`.
+    """
+    loader = loader_class(stream)
+    loader.intern_table = intern_table
+    try:
+        while loader.check_data():
+            yield loader.get_data()
+    finally:
+        loader.dispose()
+
+
+def load_file(
+    location,
+    allow_duplicate_keys=True,
+    keys=None,
+    track_changes=False,
+    intern=None,
+    share_subtrees=False,
+    records=None,
+):
+    """
+    Return an object safely loaded from the YAML file at `location`. The file
+    is read incrementally as a binary stream by the loader without first
+    reading its whole content in memory.
+
+    If `allow_duplicate_keys` is False, a DuplicateYamlMappingKeyError Exception
+    is raised if a mapping contains duplicated keys.
+
+    If `keys` is provided, return a mapping of only these top-level keys and
+    their values as with `load`: the file is only read as far as needed to find
+    these keys.
+
+    If `track_changes` is True, return a document that records if it has been
+    modified as with `load`.
+
+    If `intern` is True or an InternTable, mapping keys and short string values
+    are interned as with `load`.
+
+    If `share_subtrees` is True, return a read-only document where equal
+    mappings and lists are shared as with `load`.
+
+    If `records` is 'columnar', return a document where the lists of mappings
+    with the same keys are loaded as RecordTable as with `load`.
+    """
+    if records is not None:
+        check_records(records)
+        if track_changes or share_subtrees:
+            raise ValueError('records cannot be combined with track_changes or share_subtrees')
+        data = load_file(
+            location, allow_duplicate_keys=allow_duplicate_keys, keys=keys, intern=intern)
+        return get_records(data)
+
+    if share_subtrees:
+        if track_changes:
+            raise ValueError('share_subtrees cannot be combined with track_changes')
+        data = load_file(
+            location, allow_duplicate_keys=allow_duplicate_keys, keys=keys, intern=intern)
+        return get_shared(data)
+
+    if track_changes:
+        return load(
+            read_file(location),
+            allow_duplicate_keys=allow_duplicate_keys,
+            keys=keys,
+            track_changes=True,
+            intern=intern,
+        )
+
+    loader = get_loader_class(allow_duplicate_keys)
+    intern_table = get_intern_table(intern)
+    if keys is not None:
+        check_keys(keys)
+
+    with io.open(location, 'rb') as stream:
+        if keys is not None:
+            try:
+                return load_keys_from_events(stream, loader, keys, intern_table)
+            except UnsupportedNodeError:
+                stream.seek(0)
+            return select_keys(load_from_nodes(stream, loader, intern_table), keys)
+
+        if instruments:
+            return load_instrumented(stream, loader, intern_table)
+        try:
+            return load_from_events(stream, loader, intern_table)
+        except UnsupportedNodeError:
+            stream.seek(0)
+        return load_from_nodes(stream, loader, intern_table)
+
+
+def load_many(items, as_files=False, allow_duplicate_keys=True, workers=None, chunk_size=16):
+    """
+    Return a list of (object, error) tuples loaded from an `items` iterable of
+    YAML strings or of YAML file locations if `as_files` is True. The list is
+    in the same order as `items`. `error` is the Exception raised when loading
+    an item or None.
+
+    Items are loaded in parallel in a pool of `workers` processes by chunks of
+    `chunk_size` items. `workers` defaults to the number of CPUs. If `workers`
+    is 1 or less, items are loaded sequentially in the current process.
+
+    If `allow_duplicate_keys` is False, a DuplicateYamlMappingKeyError Exception
+    is returned for an item if a mapping contains duplicated keys.
+    """
+    loader = partial(
+        load_item,
+        as_file=as_files,
+        allow_duplicate_keys=allow_duplicate_keys,
+    )
+
+    return parallel_map(loader, items, workers=workers, chunk_size=chunk_size)
+
+
+def load_item(item, as_file=False, allow_duplicate_keys=True):
+    """
+    Return an (object, error) tuple loaded from an `item` YAML string or YAML
+    file location if `as_file` is True. `error` is the Exception raised when
+    loading or None.
+    """
+    try:
+        if as_file:
+            obj = load_file(item, allow_duplicate_keys=allow_duplicate_keys)
+        else:
+            obj = load(item, allow_duplicate_keys=allow_duplicate_keys)
+        return obj, None
+    except Exception as e:
+        return None, e
+
+
+def parallel_map(function, *iterables, workers=None, chunk_size=16):
+    """
+    Return a list of the results of calling `function` on each items of the
+    `iterables` in a pool of `workers` processes by chunks of `chunk_size`
+    items. The list is in the same order as the `iterables` items. `workers`
+    defaults to the number of CPUs. If `workers` is 1 or less, `function` is
+    called sequentially in the current process.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        return list(map(function, *iterables))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, *iterables, chunksize=chunk_size))
+
+
+def get_loader_class(allow_duplicate_keys=True):
+    """
+    Return a Loader class checking or not for duplicated keys based on the
+    `allow_duplicate_keys` flag.
     """
     if allow_duplicate_keys:
-        loader = SaneLoader
+        return SaneLoader
     else:
-        loader = DupeKeySaneLoader
-    return yaml.load(s, Loader=loader)
+        return DupeKeySaneLoader
+
+
+# default maximum number of strings of an InternTable
+INTERN_MAX_SIZE = 64 * 1024
+
+# default maximum length of the strings interned in an InternTable
+INTERN_MAX_LENGTH = 64
+
+
+class InternTable(object):
+    """
+    A bounded table of interned strings to load mapping keys and short string
+    values repeated in one or many YAML documents as the same string objects
+    such that they are stored only once in memory. Share an InternTable across
+    a batch of loads to share these strings across all the loaded documents.
+
+    Only strings of up to `max_length` characters are interned. Once the table
+    holds `max_size` strings, the strings already in the table are still
+    interned but new strings are not added.
+    """
+
+    def __init__(self, max_size=INTERN_MAX_SIZE, max_length=INTERN_MAX_LENGTH):
+        self.max_size = max_size
+        self.max_length = max_length
+        # {string: string}
+        self.strings = {}
+
+    def intern(self, value):
+        """
+        Return the interned string equal to a `value` string or `value`.
+        """
+        if len(value) > self.max_length:
+            return value
+        strings = self.strings
+        interned = strings.get(value)
+        if interned is not None:
+            return interned
+        if len(strings) < self.max_size:
+            strings[value] = value
+        return value
+
+    def __len__(self):
+        return len(self.strings)
+
+    def clear(self):
+        self.strings.clear()
+
+
+def get_intern_table(intern):
+    """
+    Return an InternTable or None based on an `intern` load argument that is
+    either an InternTable, True for a new InternTable or a false value.
+    """
+    if isinstance(intern, InternTable):
+        return intern
+    if intern:
+        return InternTable()
+
+
+# A validation issue `kind` with a `message` at a 1-based `line` and `column`
+ValidationIssue = namedtuple('ValidationIssue', 'kind message line column')
+
+
+def validate(stream):
+    """
+    Return a list of ValidationIssue found in all the documents of a YAML
+    `stream` without loading it: the stream is only parsed to events and
+    values are not constructed. The issue kinds are:
+
+    - duplicate-key: a mapping key that is not unique in its mapping.
+    - complex-key: a mapping or list used as a mapping key.
+    - unknown-tag: a tag that is ignored or not supported when loading, such
+      as ruby tags.
+    - alias: an alias that is loaded as its anchored value and is not kept
+      when dumping.
+    - undefined-alias: an alias to an anchor that does not exist.
+    - duplicate-anchor: an anchor defined more than once.
+    - syntax-error: a YAML syntax error. The stream is not checked further.
+    """
+    loader = SaneLoader(stream)
+    issues = []
+
+    def add_issue(kind, message, mark):
+        issues.append(ValidationIssue(kind, message, mark.line + 1, mark.column + 1))
+
+    get_event = loader.get_event
+    resolve = loader.resolve
+    constructors = loader.yaml_constructors
+    bool_loader = SafeConstructor.construct_yaml_bool
+    bool_values = loader.bool_values
+    # plain scalars are resolved only if they start with a character of an
+    # implicit resolver for a boolean or for a tag without constructor
+    resolved_chars = set(
+        char for char, resolvers in loader.yaml_implicit_resolvers.items()
+        if any(constructors.get(tag) in (None, bool_loader) for tag, _ in resolvers)
+    )
+    # a key value for collections used as mapping keys
+    complex_key = object()
+
+    # {anchor: key value}
+    anchors = {}
+    # stack of [keys set or None for a list, True if the next node is a key]
+    stack = []
+    try:
+        while True:
+            event = get_event()
+            event_class = event.__class__
+
+            if event_class is ScalarEvent:
+                tag = event.tag
+                value = event.value
+                if tag is None or tag == '!':
+                    if event.implicit[0] and value[:1] in resolved_chars:
+                        tag = resolve(ScalarNode, value, event.implicit)
+                        constructor = constructors.get(tag)
+                        if constructor is bool_loader:
+                            value = bool_values.get(value.lower(), value)
+                        elif constructor is None:
+                            add_issue(
+                                'unknown-tag', 'Unknown tag: {}'.format(tag), event.start_mark)
+                elif tag not in constructors:
+                    add_issue('unknown-tag', 'Unknown tag: {}'.format(tag), event.start_mark)
+
+            elif event_class is MappingEndEvent or event_class is SequenceEndEvent:
+                stack.pop()
+                continue
+
+            elif event_class is MappingStartEvent or event_class is SequenceStartEvent:
+                tag = event.tag
+                if tag is not None and tag != '!' and tag not in constructors:
+                    add_issue('unknown-tag', 'Unknown tag: {}'.format(tag), event.start_mark)
+                value = complex_key
+
+            elif event_class is AliasEvent:
+                anchor = event.anchor
+                if anchor in anchors:
+                    value = anchors[anchor]
+                    add_issue('alias', 'Alias is loaded as its anchored value and not kept '
+                        'when dumping: *{}'.format(anchor), event.start_mark)
+                else:
+                    value = None
+                    add_issue(
+                        'undefined-alias', 'Undefined alias: *{}'.format(anchor), event.start_mark)
+
+            elif event_class is DocumentStartEvent:
+                anchors = {}
+                continue
+
+            elif event_class is StreamEndEvent:
+                break
+
+            else:
+                continue
+
+            if event_class is not AliasEvent:
+                anchor = event.anchor
+                if anchor is not None:
+                    if anchor in anchors:
+                        add_issue(
+                            'duplicate-anchor',
+                            'Duplicate anchor: &{}'.format(anchor),
+                            event.start_mark,
+                        )
+                    anchors[anchor] = value
+
+            if stack:
+                parent = stack[-1]
+                keys = parent[0]
+                if keys is not None:
+                    if parent[1]:
+                        if value is complex_key:
+                            add_issue(
+                                'complex-key', 'Mapping or list used as a key', event.start_mark)
+                        elif value in keys:
+                            add_issue('duplicate-key',
+                                'Duplicate key in YAML source: {}'.format(value), event.start_mark)
+                        else:
+                            keys.add(value)
+                    parent[1] = not parent[1]
+
+            if event_class is MappingStartEvent:
+                stack.append([set(), True])
+            elif event_class is SequenceStartEvent:
+                stack.append([None, False])
+
+    except MarkedYAMLError as e:
+        mark = e.problem_mark or e.context_mark
+        issues.append(ValidationIssue(
+            'syntax-error',
+            e.problem or str(e),
+            mark.line + 1 if mark else 0,
+            mark.column + 1 if mark else 0,
+        ))
+    finally:
+        loader.dispose()
+    return issues
+
+
+# Version of the CachedLoader cache entries format
+CACHE_FORMAT = 1
+# Default maximum size in bytes of a CachedLoader cache directory
+CACHE_MAX_SIZE = 64 * 1024 * 1024
+# Cache entries of files modified this close in nanoseconds to the time they
+# were cached are checked against the file content hash, as the file could have
+# changed again within the same mtime granularity.
+CACHE_RACY_NS = 2 * 1000 * 1000 * 1000
+
+
+class CachedLoader(object):
+    """
+    Load YAML files caching the loaded objects in a `cache_dir` directory such
+    that unchanged files are not parsed again, including across processes.
+
+    Each cache entry is a pickle keyed by the absolute file path and validated
+    against the file size and mtime. When only the mtime differs, or when the
+    file was modified right before it was cached, the file content hash is
+    compared instead. The least recently used entries are evicted when the
+    cache directory grows beyond `max_size` bytes.
+
+    A CachedLoader is not thread-safe, but many processes can share the same
+    `cache_dir`: cache entries are written atomically.
+    """
+
+    def __init__(self, cache_dir, allow_duplicate_keys=True, max_size=CACHE_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.allow_duplicate_keys = allow_duplicate_keys
+        self.max_size = max_size
+        # total size in bytes of the cache directory, computed when needed
+        self.size = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def load_file(self, location):
+        """
+        Return an object safely loaded from the YAML file at `location` from
+        the cache if this file is unchanged since it was cached.
+        """
+        location = os.path.abspath(location)
+        cache_location = self.get_cache_location(location)
+        stat = os.stat(location)
+        try:
+            obj = self.get_cached(location, cache_location, stat)
+        except Exception:
+            # a missing, corrupted or stale cache entry
+            pass
+        else:
+            self.hits += 1
+            return obj
+
+        self.misses += 1
+        content = read_file(location)
+        obj = load(content, allow_duplicate_keys=self.allow_duplicate_keys)
+        self.store(cache_location, obj, content, stat)
+        return obj
+
+    def get_cached(self, location, cache_location, stat):
+        """
+        Return the object cached at `cache_location` for the file at `location`
+        with a `stat` os.stat_result. Raise an Exception if the cache entry is
+        missing, corrupted or stale.
+        """
+        content = None
+        with io.open(cache_location, 'rb') as cache:
+            cache_format, size, mtime_ns, cached_ns, digest = pickle.load(cache)
+            if cache_format != CACHE_FORMAT or size != stat.st_size:
+                raise ValueError('Stale cache entry: {}'.format(cache_location))
+            if mtime_ns != stat.st_mtime_ns or cached_ns - mtime_ns <= CACHE_RACY_NS:
+                content = read_file(location)
+                if hashlib.sha1(content).hexdigest() != digest:
+                    raise ValueError('Stale cache entry: {}'.format(cache_location))
+            obj = pickle.load(cache)
+
+        if content is None:
+            # mark as recently used
+            os.utime(cache_location)
+        else:
+            # update the entry to avoid checking the content hash again
+            self.store(cache_location, obj, content, stat)
+        return obj
+
+    def get_cache_location(self, location):
+        """
+        Return the location of the cache entry of the file at the absolute
+        `location`.
+        """
+        key = '{}\0{}'.format(location, self.allow_duplicate_keys)
+        name = hashlib.sha1(key.encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(self.cache_dir, name + '.pickle')
+
+    def store(self, cache_location, obj, content, stat):
+        """
+        Atomically write the cache entry at `cache_location` for the `obj`
+        loaded from a file with `content` bytes and `stat` os.stat_result.
+        Ignore objects that cannot be pickled.
+        """
+        header = (
+            CACHE_FORMAT,
+            stat.st_size,
+            stat.st_mtime_ns,
+            time.time_ns(),
+            hashlib.sha1(content).hexdigest(),
+        )
+        temp_location = '{}.{}.tmp'.format(cache_location, uuid.uuid4().hex)
+        try:
+            with io.open(temp_location, 'wb') as cache:
+                pickle.dump(header, cache, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(obj, cache, protocol=pickle.HIGHEST_PROTOCOL)
+                entry_size = cache.tell()
+            os.replace(temp_location, cache_location)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            if os.path.exists(temp_location):
+                os.remove(temp_location)
+            return
+
+        if self.size is None:
+            self.size = self.get_entries_size()
+        else:
+            self.size += entry_size
+        if self.size > self.max_size:
+            self.evict()
+
+    def get_entries(self):
+        """
+        Return a list of (last used time, size, location) for each cache entry.
+        """
+        entries = []
+        with os.scandir(self.cache_dir) as scanned:
+            for entry in scanned:
+                if not entry.name.endswith('.pickle'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def get_entries_size(self):
+        """
+        Return the total size in bytes of the cache entries.
+        """
+        return sum(size for _, size, _ in self.get_entries())
+
+    def evict(self):
+        """
+        Remove the least recently used cache entries until the cache size is
+        below `max_size`.
+        """
+        entries = sorted(self.get_entries())
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, location in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(location)
+            except OSError:
+                continue
+            size -= entry_size
+            self.evictions += 1
+        self.size = size
+
+    def report(self):
+        """
+        Return a mapping of cache statistics: the count of cache hits, misses
+        and evictions, the hit rate and the cache size in bytes.
+        """
+        lookups = self.hits + self.misses
+        if self.size is None:
+            self.size = self.get_entries_size()
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=self.hits / lookups if lookups else 0.0,
+            evictions=self.evictions,
+            size=self.size,
+        )
+
+
+def read_file(location):
+    """
+    Return the bytes content of the file at `location`.
+    """
+    with io.open(location, 'rb') as inp:
+        return inp.read()
+
+
+# Header of snapshot files, including the snapshot format version
+SNAPSHOT_MAGIC = b'saneyaml snapshot 1\n'
+# Trailer of snapshot files: the offset of the pickled index
+SNAPSHOT_TRAILER = struct.Struct('<Q')
+
+
+def build_snapshot(directory, pattern, location, allow_duplicate_keys=True):
+    """
+    Write a snapshot file at `location` of all the YAML files in `directory`
+    and its subdirectories whose name matches the `pattern` glob pattern, such
+    as `*.yml`. Return a sorted list of the relative paths of the loaded files.
+
+    A snapshot file packs the loaded objects of all files, pickled one after
+    the other, followed by an index of the relative POSIX path, size, mtime and
+    content SHA1 of each file. If a snapshot already exists at `location`, it
+    is rebuilt incrementally: only new and changed files are loaded again and
+    the pickled objects of unchanged files are copied as-is. Files are
+    considered changed as with a CachedLoader.
+
+    The snapshot is written to a temporary file that is then atomically renamed
+    to `location`.
+    """
+    location = os.path.abspath(location)
+    previous = None
+    if os.path.exists(location):
+        try:
+            previous = Snapshot(location)
+        except Exception:
+            # an unusable snapshot is rebuilt from scratch
+            pass
+
+    loaded = []
+    index = {}
+    # taken before any file is read, so that a file modified while the
+    # snapshot is built is within the racy window of its next rebuild
+    built_ns = time.time_ns()
+    temp_location = '{}.{}.tmp'.format(location, uuid.uuid4().hex)
+    try:
+        with io.open(temp_location, 'wb') as out:
+            out.write(SNAPSHOT_MAGIC)
+            for path, file_location in get_files(directory, pattern):
+                stat = os.stat(file_location)
+                data = content = digest = None
+                if previous is not None:
+                    data, content, digest = previous.get_unchanged(path, file_location, stat)
+                if data is None:
+                    if content is None:
+                        content = read_file(file_location)
+                        digest = hashlib.sha1(content).hexdigest()
+                    obj = load(content, allow_duplicate_keys=allow_duplicate_keys)
+                    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+                    loaded.append(path)
+                index[path] = (out.tell(), len(data), stat.st_size, stat.st_mtime_ns, digest)
+                out.write(data)
+
+            index_offset = out.tell()
+            pickle.dump((built_ns, index), out, protocol=pickle.HIGHEST_PROTOCOL)
+            out.write(SNAPSHOT_TRAILER.pack(index_offset))
+
+        if previous is not None:
+            previous.close()
+        os.replace(temp_location, location)
+    except BaseException:
+        if previous is not None:
+            previous.close()
+        if os.path.exists(temp_location):
+            os.remove(temp_location)
+        raise
+    return loaded
+
+
+def get_files(directory, pattern):
+    """
+    Return a sorted list of (relative POSIX path, location) for the files in
+    `directory` and its subdirectories whose name matches the `pattern` glob
+    pattern.
+    """
+    paths = []
+    for top, dirs, files in os.walk(directory):
+        for name in files:
+            if fnmatch.fnmatch(name, pattern):
+                file_location = os.path.join(top, name)
+                path = os.path.relpath(file_location, directory).replace(os.sep, '/')
+                paths.append((path, file_location))
+    paths.sort()
+    return paths
+
+
+def open_snapshot(location):
+    """
+    Return a read-only Snapshot mapping of {relative path: loaded object} from
+    a snapshot file at `location` built with `build_snapshot`.
+    """
+    return Snapshot(location)
+
+
+class Snapshot(Mapping):
+    """
+    A read-only mapping of {relative path: loaded object} of a snapshot file.
+    The file is memory-mapped and each object is unpickled only when first
+    accessed. Close the Snapshot or use it as a context manager to release the
+    memory-mapped file.
+
+    The `index` is a mapping of {relative path: (offset, length, size, mtime,
+    sha1)} with the offset and length of the pickled object and the size, mtime
+    in nanoseconds and content SHA1 of the loaded file.
+    """
+
+    def __init__(self, location):
+        with io.open(location, 'rb') as inp:
+            self.mmap = mmap.mmap(inp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            trailer_offset = len(self.mmap) - SNAPSHOT_TRAILER.size
+            magic = self.mmap[:len(SNAPSHOT_MAGIC)]
+            if magic != SNAPSHOT_MAGIC or trailer_offset < len(SNAPSHOT_MAGIC):
+                raise ValueError('Not a saneyaml snapshot: {}'.format(location))
+            index_offset, = SNAPSHOT_TRAILER.unpack(self.mmap[trailer_offset:])
+            self.built_ns, self.index = pickle.loads(self.mmap[index_offset:trailer_offset])
+        except BaseException:
+            self.mmap.close()
+            raise
+        self.objects = {}
+
+    def __getitem__(self, path):
+        objects = self.objects
+        if path in objects:
+            return objects[path]
+        offset, length, _, _, _ = self.index[path]
+        obj = objects[path] = pickle.loads(self.mmap[offset:offset + length])
+        return obj
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, path):
+        return path in self.index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.mmap.close()
+
+    def get_unchanged(self, path, location, stat):
+        """
+        Return a tuple of (pickled object, content, sha1) for the file at
+        `location` with the relative `path` and a `stat` os.stat_result. The
+        pickled object bytes are None if the file is new or has changed since
+        this snapshot was built. The content bytes and sha1 are None unless the
+        file had to be read to check if it changed.
+        """
+        entry = self.index.get(path)
+        if entry is None:
+            return None, None, None
+
+        offset, length, size, mtime_ns, digest = entry
+        if size != stat.st_size:
+            return None, None, None
+
+        content = None
+        if mtime_ns != stat.st_mtime_ns or self.built_ns - mtime_ns <= CACHE_RACY_NS:
+            content = read_file(location)
+            current_digest = hashlib.sha1(content).hexdigest()
+            if current_digest != digest:
+                return None, content, current_digest
+        return self.mmap[offset:offset + length], content, digest
 
 
 class UnsupportedYamlFeatureError(YAMLError):
@@ -71,11 +1039,17 @@ class BaseSaneLoader(SafeLoader):
     A base safe loader configured with many sane defaults.
     """
 
+    # an optional InternTable for the loaded strings
+    intern_table = None
+
     def string_loader(loader, node):  # NOQA
         """
         Ensure that a scalar type (a value) is returned as a plain unicode string.
         """
-        return loader.construct_scalar(node)
+        value = loader.construct_scalar(node)
+        if loader.intern_table is not None:
+            value = loader.intern_table.intern(value)
+        return value
 
     def ordered_loader(self, node, check_dupe=False):
         """
@@ -92,66 +1066,1488 @@ class BaseSaneLoader(SafeLoader):
                 raise UnsupportedYamlFeatureError('Duplicate key in YAML source: {}'.format(key))
             omap[key] = value
 
+    def construct_document(self, node):
+        """
+        Return an object constructed from a document `node`. Use a fast path
+        for the common case of documents made only of mappings, lists and
+        scalars loaded as strings or booleans. Fall back to the PyYAML
+        constructors for anything else such as tags with other constructors or
+        complex mapping keys.
+        """
+        try:
+            return self.construct_simple_document(node)
+        except UnsupportedNodeError:
+            return super(BaseSaneLoader, self).construct_document(node)
+
+    def construct_simple_document(self, node):
+        """
+        Return an object constructed from a document `node` without recursion
+        or generators. Raise an UnsupportedNodeError if the document contains
+        any node that is not supported.
+
+        Mappings and lists are created empty when first seen and filled later
+        in the same breadth-first order as the PyYAML generator constructors
+        such that duplicate keys errors are reported the same way. Aliased nodes
+        are the same node objects and are constructed only once.
+        """
+        if self.yaml_multi_constructors:
+            raise UnsupportedNodeError()
+
+        constructors = self.yaml_constructors
+        default_constructor = constructors.get(None)
+        string_loader = BaseSaneLoader.string_loader
+        bool_loader = SafeConstructor.construct_yaml_bool
+        bool_values = self.bool_values
+        intern = self.intern_table.intern if self.intern_table is not None else None
+
+        # {id(node): object} for mappings and sequences
+        objects = {}
+        # list of (node, object, check_dupe) for mappings and sequences to fill
+        to_fill = []
+
+        def construct(node):
+            node_class = node.__class__
+            constructor = constructors.get(node.tag, default_constructor)
+
+            if node_class is ScalarNode:
+                if constructor is string_loader:
+                    if intern is not None:
+                        return intern(node.value)
+                    return node.value
+                if constructor is bool_loader:
+                    return bool_values[node.value.lower()]
+                raise UnsupportedNodeError()
+
+            obj = objects.get(id(node))
+            if obj is not None:
+                return obj
+
+            check_dupe = None
+            if node_class is MappingNode:
+                check_dupe = ordered_loaders.get(constructor)
+                if check_dupe is None:
+                    raise UnsupportedNodeError()
+                obj = {}
+            elif node_class is SequenceNode and constructor is SafeConstructor.construct_yaml_seq:
+                obj = []
+            else:
+                raise UnsupportedNodeError()
+
+            objects[id(node)] = obj
+            to_fill.append((node, obj, check_dupe))
+            return obj
+
+        data = construct(node)
+
+        # to_fill grows while we iterate
+        for node, obj, check_dupe in to_fill:
+            if check_dupe is None:
+                obj.extend(construct(item) for item in node.value)
+                continue
+
+            for key, value in node.value:
+                if key.__class__ is not ScalarNode:
+                    raise UnsupportedNodeError()
+                key = construct(key)
+                value = construct(value)
+                if check_dupe and key in obj:
+                    raise UnsupportedYamlFeatureError(
+                        'Duplicate key in YAML source: {}'.format(key))
+                obj[key] = value
+
+        return data
+
+    def get_single_data_from_events(self):
+        """
+        Return an object constructed directly from the parser events of a
+        single document stream, without composing a node graph first. This
+        supports the same documents as `construct_simple_document`.
+
+        Raise an UnsupportedNodeError for anything else, including duplicated
+        keys, anchors or aliases errors, or multiple documents: the stream
+        should then be loaded again with `get_single_data` to get the same
+        result or error as with the PyYAML constructors.
+        """
+        if self.yaml_multi_constructors or self.yaml_path_resolvers:
+            raise UnsupportedNodeError()
+
+        # skip the stream start
+        self.get_event()
+        if self.check_event(StreamEndEvent):
+            self.get_event()
+            return
+
+        # skip the document start
+        self.get_event()
+        data = self.construct_from_events(anchors={})
+        # skip the document end
+        self.get_event()
+
+        if not self.check_event(StreamEndEvent):
+            # multiple documents
+            raise UnsupportedNodeError()
+        self.get_event()
+        return data
+
+    def construct_from_events(self, anchors):
+        """
+        Return an object constructed from the parser events of the next node,
+        updating the `anchors` {anchor: object} mapping with the anchored
+        objects. Raise an UnsupportedNodeError for unsupported nodes.
+        """
+        get_event = self.get_event
+        resolve = self.resolve
+        constructors = self.yaml_constructors
+        default_constructor = constructors.get(None)
+        string_loader = BaseSaneLoader.string_loader
+        bool_loader = SafeConstructor.construct_yaml_bool
+        seq_loader = SafeConstructor.construct_yaml_seq
+        bool_values = self.bool_values
+        intern = self.intern_table.intern if self.intern_table is not None else None
+
+        data = None
+        # stack of (container, is_mapping, check_dupe) for the enclosing
+        # mappings and sequences
+        stack = []
+        container = None
+        is_mapping = False
+        check_dupe = False
+        # the current mapping key or `no_key` if the next scalar is a key
+        no_key = key = object()
+
+        while True:
+            event = get_event()
+            event_class = event.__class__
+
+            if event_class is ScalarEvent:
+                tag = event.tag
+                if tag is None or tag == '!':
+                    tag = resolve(ScalarNode, event.value, event.implicit)
+                constructor = constructors.get(tag, default_constructor)
+                if constructor is string_loader:
+                    value = event.value
+                    if intern is not None:
+                        value = intern(value)
+                elif constructor is bool_loader:
+                    value = bool_values[event.value.lower()]
+                else:
+                    raise UnsupportedNodeError()
+
+            elif event_class is MappingStartEvent or event_class is SequenceStartEvent:
+                if is_mapping and key is no_key:
+                    # complex mapping key
+                    raise UnsupportedNodeError()
+
+                tag = event.tag
+                if event_class is MappingStartEvent:
+                    if tag is None or tag == '!':
+                        tag = resolve(MappingNode, None, event.implicit)
+                    value_check_dupe = ordered_loaders.get(
+                        constructors.get(tag, default_constructor))
+                    if value_check_dupe is None:
+                        raise UnsupportedNodeError()
+                    value = {}
+                else:
+                    if tag is None or tag == '!':
+                        tag = resolve(SequenceNode, None, event.implicit)
+                    if constructors.get(tag, default_constructor) is not seq_loader:
+                        raise UnsupportedNodeError()
+                    value_check_dupe = False
+                    value = []
+
+            elif event_class is MappingEndEvent or event_class is SequenceEndEvent:
+                container, is_mapping, check_dupe = stack.pop()
+                if container is None:
+                    return data
+                continue
+
+            elif event_class is AliasEvent:
+                if event.anchor not in anchors:
+                    raise UnsupportedNodeError()
+                value = anchors[event.anchor]
+                if is_mapping and key is no_key and isinstance(value, (dict, list)):
+                    # complex mapping key
+                    raise UnsupportedNodeError()
+
+            else:
+                raise UnsupportedNodeError()
+
+            anchor = getattr(event, 'anchor', None)
+            if anchor is not None and event_class is not AliasEvent:
+                if anchor in anchors:
+                    raise UnsupportedNodeError()
+                anchors[anchor] = value
+
+            if container is None:
+                data = value
+            elif not is_mapping:
+                container.append(value)
+            elif key is no_key:
+                key = value
+            else:
+                if check_dupe and key in container:
+                    raise UnsupportedNodeError()
+                container[key] = value
+                key = no_key
+
+            if event_class is MappingStartEvent or event_class is SequenceStartEvent:
+                stack.append((container, is_mapping, check_dupe))
+                container = value
+                is_mapping = event_class is MappingStartEvent
+                check_dupe = value_check_dupe
+            elif container is None:
+                return data
+
+    def get_keys_data_from_events(self, keys):
+        """
+        Return a mapping of the `keys` top-level keys found in the mapping of a
+        single document stream and their values, constructed directly from the
+        parser events. The values of other keys are skipped without being
+        constructed and parsing stops as soon as all the `keys` have been
+        found: the rest of the document is not checked for errors or duplicated
+        keys.
+
+        Raise an UnsupportedNodeError if the document is not a mapping or for
+        the same cases as `get_single_data_from_events`.
+        """
+        if self.yaml_multi_constructors or self.yaml_path_resolvers:
+            raise UnsupportedNodeError()
+
+        # skip the stream start
+        self.get_event()
+        if self.check_event(StreamEndEvent):
+            self.get_event()
+            return
+
+        # skip the document start
+        self.get_event()
+        event = self.get_event()
+        if event.__class__ is not MappingStartEvent or event.anchor is not None:
+            raise UnsupportedNodeError()
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = self.resolve(MappingNode, None, event.implicit)
+        constructors = self.yaml_constructors
+        check_dupe = ordered_loaders.get(constructors.get(tag, constructors.get(None)))
+        if check_dupe is None:
+            raise UnsupportedNodeError()
+
+        data = {}
+        anchors = {}
+        skipped_anchors = set()
+        seen_keys = set()
+        keys = frozenset(keys)
+        missing_keys = set(keys)
+
+        while missing_keys and not self.check_event(MappingEndEvent):
+            key = self.construct_from_events(anchors)
+            if isinstance(key, (dict, list)):
+                # complex mapping key
+                raise UnsupportedNodeError()
+            if check_dupe:
+                if key in seen_keys:
+                    raise UnsupportedNodeError()
+                seen_keys.add(key)
+
+            if key in keys:
+                data[key] = self.construct_from_events(anchors)
+                missing_keys.discard(key)
+            else:
+                self.skip_events(anchors, skipped_anchors)
+
+        if not skipped_anchors.isdisjoint(anchors):
+            # duplicated anchor
+            raise UnsupportedNodeError()
+        return data
+
+    def skip_events(self, anchors, skipped_anchors):
+        """
+        Skip the parser events of the next node without constructing it, adding
+        its anchors to the `skipped_anchors` set. Raise an UnsupportedNodeError
+        on anchors or aliases errors.
+        """
+        get_event = self.get_event
+        depth = 0
+        while True:
+            event = get_event()
+            event_class = event.__class__
+            anchor = getattr(event, 'anchor', None)
+            if event_class is AliasEvent:
+                if anchor not in anchors and anchor not in skipped_anchors:
+                    raise UnsupportedNodeError()
+            elif anchor is not None:
+                if anchor in anchors or anchor in skipped_anchors:
+                    raise UnsupportedNodeError()
+                skipped_anchors.add(anchor)
+
+            if event_class is MappingStartEvent or event_class is SequenceStartEvent:
+                depth += 1
+            elif event_class is MappingEndEvent or event_class is SequenceEndEvent:
+                depth -= 1
+            if not depth:
+                return
+
+
+class UnsupportedNodeError(Exception):
+    """
+    Raised when a node or event is not supported by the fast document
+    construction.
+    """
+    pass
+
+
+# Load most types as strings : nulls, ints, (such as in version 01) floats (such
+# as version 2.20) and timestamps conversion (in versions too), booleans are all
+# loaded as plain strings.
+# This avoid unwanted type conversions for unquoted strings and the resulting
+# content damaging. This overrides the implicit resolvers. Callers must handle
+# type conversion explicitly from unicode to other types in the loaded objects.
+# NOTE: we are still using the built-in loader for booleans. It will recognize
+# yes/no as a boolean.
+BaseSaneLoader.add_constructor('tag:yaml.org,2002:str', BaseSaneLoader.string_loader)
+BaseSaneLoader.add_constructor('tag:yaml.org,2002:null', BaseSaneLoader.string_loader)
+BaseSaneLoader.add_constructor('tag:yaml.org,2002:boolean', BaseSaneLoader.string_loader)
+BaseSaneLoader.add_constructor('tag:yaml.org,2002:timestamp', BaseSaneLoader.string_loader)
+BaseSaneLoader.add_constructor('tag:yaml.org,2002:float', BaseSaneLoader.string_loader)
+BaseSaneLoader.add_constructor('tag:yaml.org,2002:int', BaseSaneLoader.string_loader)
+BaseSaneLoader.add_constructor('tag:yaml.org,2002:null', BaseSaneLoader.string_loader)
+# Fall back to mapping for anything else, e.g. ignore tags such as
+# !!Python, ruby and other dangerous mappings: treat them as a mapping
+BaseSaneLoader.add_constructor(None, BaseSaneLoader.ordered_loader)
+
+
+class SaneLoader(BaseSaneLoader):
+    pass
+
+
+# Always load mapping as ordered mappings
+SaneLoader.add_constructor('tag:yaml.org,2002:map', BaseSaneLoader.ordered_loader)
+SaneLoader.add_constructor('tag:yaml.org,2002:omap', BaseSaneLoader.ordered_loader)
+
+
+class DupeKeySaneLoader(BaseSaneLoader):
+    """
+    A variant that check that maps do not contain duplicate keys.
+    Raise DuplicateYamlMappingKeyError on duplicate.
+    """
+    pass
+
+
+# Always load mapping as ordered mappings
+dupe_checkding_ordered_loader = partial(BaseSaneLoader.ordered_loader, check_dupe=True)
+DupeKeySaneLoader.add_constructor('tag:yaml.org,2002:map', dupe_checkding_ordered_loader)
+DupeKeySaneLoader.add_constructor('tag:yaml.org,2002:omap', dupe_checkding_ordered_loader)
+
+# {mapping constructor: check_dupe} for the mappings constructors supported by
+# the BaseSaneLoader.construct_simple_document fast path
+ordered_loaders = {
+    BaseSaneLoader.ordered_loader: False,
+    dupe_checkding_ordered_loader: True,
+}
+
+
+class LazyConstructor(object):
+    """
+    Construct the LazyMapping and LazySequence of a document from the parser
+    events of a YAML `source` string using a `loader_class` Loader class.
+
+    The whole document is first scanned to check that all its nodes are
+    supported and to register its anchors. A mapping or list is then parsed
+    again from its own source span only when first accessed, constructing its
+    scalars and creating a LazyMapping or LazySequence for each of its mappings
+    and lists: the nested mappings and lists are skipped.
+    """
+
+    def __init__(self, source, loader_class):
+        self.source = source
+        self.loader_class = loader_class
+        self.constructors = constructors = loader_class.yaml_constructors
+        self.default_constructor = constructors.get(None)
+        self.check_dupe = ordered_loaders.get(
+            constructors.get('tag:yaml.org,2002:map', self.default_constructor))
+        # {anchor: scalar value, LazyMapping or LazySequence}: anchors are unique
+        # in a supported document
+        self.anchors = {}
+
+    def load(self):
+        """
+        Return the object of a single document source. Raise an
+        UnsupportedNodeError if the source should be loaded with
+        `load_from_nodes`.
+        """
+        loader_class = self.loader_class
+        if (
+            self.check_dupe is None
+            or loader_class.yaml_multi_constructors
+            or loader_class.yaml_path_resolvers
+        ):
+            raise UnsupportedNodeError()
+
+        loader = loader_class(self.source)
+        try:
+            # skip the stream start
+            loader.get_event()
+            if loader.check_event(StreamEndEvent):
+                return
+            if loader.get_event().tags:
+                # tag directives are not part of the source spans
+                raise UnsupportedNodeError()
+
+            data = self.scan(loader)
+
+            # skip the document end
+            loader.get_event()
+            if not loader.check_event(StreamEndEvent):
+                # multiple documents
+                raise UnsupportedNodeError()
+            return data
+        finally:
+            loader.dispose()
+
+    def get_scalar(self, loader, event, resolved_chars):
+        """
+        Return a scalar value constructed from a ScalarEvent `event` using a
+        `loader`. Plain scalars are resolved only if they start with one of the
+        `resolved_chars` characters. Raise an UnsupportedNodeError for scalars
+        that are not strings or booleans.
+        """
+        value = event.value
+        tag = event.tag
+        if tag is None or tag == '!':
+            if event.implicit[0] and value[:1] not in resolved_chars:
+                return value
+            tag = loader.resolve(ScalarNode, value, event.implicit)
+        constructor = self.constructors.get(tag, self.default_constructor)
+        if constructor is BaseSaneLoader.string_loader:
+            return value
+        if constructor is SafeConstructor.construct_yaml_bool:
+            return loader.bool_values[value.lower()]
+        raise UnsupportedNodeError()
+
+    def get_resolved_chars(self, loader, constructed=(BaseSaneLoader.string_loader,)):
+        """
+        Return a set of the first characters of the plain scalars that may be
+        resolved by a `loader` to a tag whose constructor is not one of the
+        `constructed` constructors.
+        """
+        return set(
+            char for char, resolvers in loader.yaml_implicit_resolvers.items()
+            if any(self.constructors.get(tag) not in constructed for tag, _ in resolvers)
+        )
+
+    def check_collection(self, loader, event):
+        """
+        Raise an UnsupportedNodeError if the MappingStartEvent or
+        SequenceStartEvent `event` is not a plain mapping or list.
+        """
+        is_mapping = event.__class__ is MappingStartEvent
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(MappingNode if is_mapping else SequenceNode, None, event.implicit)
+        constructor = self.constructors.get(tag, self.default_constructor)
+        if is_mapping:
+            if ordered_loaders.get(constructor) is None:
+                raise UnsupportedNodeError()
+        elif constructor is not SafeConstructor.construct_yaml_seq:
+            raise UnsupportedNodeError()
+
+    def scan(self, loader):
+        """
+        Return the object of the next node of a `loader` of the whole document,
+        checking the tags, anchors and aliases of all the events of the
+        document and registering its anchors.
+        """
+        get_event = loader.get_event
+        get_scalar = self.get_scalar
+        check_collection = self.check_collection
+        anchors = self.anchors
+        resolved_chars = self.get_resolved_chars(loader)
+        # the nested scalars are only checked: booleans need not be resolved
+        unsupported_chars = self.get_resolved_chars(
+            loader, (BaseSaneLoader.string_loader, SafeConstructor.construct_yaml_bool))
+
+        root = None
+        items = []
+        # stack of the lazy object or None of the enclosing mappings and lists
+        stack = []
+        depth = 0
+
+        while True:
+            event = get_event()
+            event_class = event.__class__
+
+            if event_class is ScalarEvent:
+                value = event.value
+                tag = event.tag
+                anchor = event.anchor
+                checked_chars = (
+                    resolved_chars if depth <= 1 or anchor is not None else unsupported_chars)
+                if (tag is not None and tag != '!') or (
+                    event.implicit[0] and value[:1] in checked_chars
+                ):
+                    value = get_scalar(loader, event, resolved_chars)
+                if anchor is not None:
+                    if anchor in anchors:
+                        raise UnsupportedNodeError()
+                    anchors[anchor] = value
+
+            elif event_class is AliasEvent:
+                if event.anchor not in anchors:
+                    raise UnsupportedNodeError()
+                value = anchors[event.anchor]
+
+            elif event_class is MappingStartEvent or event_class is SequenceStartEvent:
+                tag = event.tag
+                if tag is not None and tag != '!':
+                    check_collection(loader, event)
+                anchor = event.anchor
+                value = None
+                if depth <= 1 or anchor is not None:
+                    lazy_class = LazyMapping if event_class is MappingStartEvent else LazySequence
+                    value = lazy_class(self, start_event=event)
+                if anchor is not None:
+                    if anchor in anchors:
+                        raise UnsupportedNodeError()
+                    anchors[anchor] = value
+
+            elif event_class is MappingEndEvent or event_class is SequenceEndEvent:
+                lazy = stack.pop()
+                if lazy is not None:
+                    lazy.set_end(event.end_mark)
+                depth -= 1
+                if not depth:
+                    root.parsed = items
+                    return root
+                continue
+
+            else:
+                raise UnsupportedNodeError()
+
+            if depth == 0:
+                root = value
+            elif depth == 1:
+                items.append(value)
+
+            if event_class is MappingStartEvent or event_class is SequenceStartEvent:
+                stack.append(value)
+                depth += 1
+            elif not depth:
+                return value
+
+    def parse_items(self, lazy):
+        """
+        Return a list of the items of a `lazy` LazyMapping or LazySequence
+        parsed from its source span: the keys and values of a mapping or the
+        values of a list.
+        """
+        start, end, column = lazy.span
+        base = start - column
+        # indent the first line of the span as in the source
+        loader = self.loader_class(' ' * column + self.source[start:end])
+        try:
+            get_event = loader.get_event
+            get_scalar = self.get_scalar
+            anchors = self.anchors
+            resolved_chars = self.get_resolved_chars(loader)
+
+            # skip the stream, document and collection starts
+            get_event()
+            get_event()
+            get_event()
+
+            items = []
+            while True:
+                event = get_event()
+                event_class = event.__class__
+
+                if event_class is ScalarEvent:
+                    items.append(get_scalar(loader, event, resolved_chars))
+
+                elif event_class is AliasEvent:
+                    items.append(anchors[event.anchor])
+
+                elif event_class is MappingStartEvent or event_class is SequenceStartEvent:
+                    anchor = event.anchor
+                    if anchor is not None:
+                        # the same object as its aliases, with a known span
+                        items.append(anchors[anchor])
+                        skip_collection(get_event)
+                        continue
+                    lazy_class = LazyMapping if event_class is MappingStartEvent else LazySequence
+                    value = lazy_class(self, start_event=event, base=base)
+                    value.set_end(skip_collection(get_event), base=base)
+                    items.append(value)
+
+                else:
+                    return items
+        finally:
+            loader.dispose()
+
+
+def skip_collection(get_event):
+    """
+    Skip the events of a mapping or list that just started using the
+    `get_event` function of a loader and return the end mark of its end event.
+    """
+    depth = 1
+    while depth:
+        event = get_event()
+        event_class = event.__class__
+        if event_class is MappingStartEvent or event_class is SequenceStartEvent:
+            depth += 1
+        elif event_class is MappingEndEvent or event_class is SequenceEndEvent:
+            depth -= 1
+    return event.end_mark
+
+
+class LazyCollection(object):
+    """
+    A base class for the read-only mappings and lists lazily loaded from their
+    source span by a LazyConstructor.
+    """
+    __slots__ = ()
+
+    def __init__(self, constructor, start_event, base=0):
+        self.constructor = constructor
+        start_mark = start_event.start_mark
+        # (start index, end index, start column) in the document source: the
+        # lines of flow collections need not be indented as their first line
+        column = 0 if start_event.flow_style else start_mark.column
+        self.span = base + start_mark.index, None, column
+        # list of parsed items or None until first accessed
+        self.parsed = None
+        # constructed mapping or list or None until first accessed
+        self.data = None
+
+    def set_end(self, end_mark, base=0):
+        """
+        Set the end of the span to an `end_mark` of a source starting at the
+        `base` index of the document source.
+        """
+        start, _, column = self.span
+        self.span = start, base + end_mark.index, column
+
+    def get_parsed(self):
+        """
+        Return a list of parsed items, parsing them if needed.
+        """
+        parsed = self.parsed
+        if parsed is None:
+            parsed = self.parsed = self.constructor.parse_items(self)
+        return parsed
+
+
+class LazyMapping(LazyCollection, Mapping):
+    """
+    A read-only mapping lazily loaded from the YAML source. Its keys and
+    values are constructed on first access, and its mappings and lists are
+    themselves lazily loaded.
+    """
+    __slots__ = ('constructor', 'span', 'parsed', 'data')
+
+    def get_data(self):
+        """
+        Return a {key: value} mapping constructing it if needed.
+        """
+        data = self.data
+        if data is None:
+            parsed = self.get_parsed()
+            data = {}
+            check_dupe = self.constructor.check_dupe
+            for i in range(0, len(parsed), 2):
+                key = parsed[i]
+                if check_dupe and key in data:
+                    raise UnsupportedYamlFeatureError(
+                        'Duplicate key in YAML source: {}'.format(key))
+                data[key] = parsed[i + 1]
+            self.data = data
+            self.parsed = None
+        return data
+
+    def __getitem__(self, key):
+        return self.get_data()[key]
+
+    def __iter__(self):
+        return iter(self.get_data())
+
+    def __len__(self):
+        return len(self.get_data())
+
+    def __repr__(self):
+        return 'LazyMapping({!r})'.format(dict(self.items()))
+
+
+class LazySequence(LazyCollection, Sequence):
+    """
+    A read-only list lazily loaded from the YAML source. Its items are
+    constructed on first access, and its mappings and lists are themselves
+    lazily loaded.
+    """
+    __slots__ = ('constructor', 'span', 'parsed', 'data')
+
+    def get_data(self):
+        """
+        Return a list of the items constructing it if needed.
+        """
+        data = self.data
+        if data is None:
+            data = self.data = self.get_parsed()
+            self.parsed = None
+        return data
+
+    def __getitem__(self, index):
+        return self.get_data()[index]
+
+    def __len__(self):
+        return len(self.get_data())
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, LazySequence)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'LazySequence({!r})'.format(list(self))
+
+
+class ChangeTracker(object):
+    """
+    Track if a loaded `document` has been modified since it was loaded from a
+    YAML source of `size` bytes with a `sha1` hash.
+    """
+    __slots__ = ('document', 'changed', 'size', 'sha1')
+
+    def __init__(self, size, sha1):
+        self.document = None
+        self.changed = False
+        self.size = size
+        self.sha1 = sha1
+
+    def is_unchanged_in(self, document, location):
+        """
+        Return True if `document` is the unmodified tracked document and the
+        file at `location` contains the YAML source it was loaded from.
+        """
+        return (
+            document is self.document
+            and not self.changed
+            and os.path.exists(location)
+            and os.path.getsize(location) == self.size
+            and get_file_sha1(location) == self.sha1
+        )
+
+
+def get_tracked(obj, source):
+    """
+    Return a copy of an `obj` object loaded from a `source` YAML string where
+    all mappings and lists are replaced by TrackedDict and TrackedList sharing
+    the same ChangeTracker, or `obj` as-is if this is not a mapping or list.
+    """
+    if not isinstance(obj, (dict, list)):
+        return obj
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    tracker = ChangeTracker(size=len(source), sha1=hashlib.sha1(source).hexdigest())
+
+    # {id(object): tracked object} such that aliased objects stay shared
+    objects = {}
+    # list of (object, tracked object) to fill
+    to_fill = []
+
+    def track(value):
+        if not isinstance(value, (dict, list)):
+            return value
+        tracked = objects.get(id(value))
+        if tracked is None:
+            tracked = TrackedDict() if isinstance(value, dict) else TrackedList()
+            tracked.tracker = tracker
+            objects[id(value)] = tracked
+            to_fill.append((value, tracked))
+        return tracked
+
+    document = tracker.document = track(obj)
+    while to_fill:
+        value, tracked = to_fill.pop()
+        # use the base class methods that do not record changes
+        if isinstance(value, dict):
+            dict.update(tracked, [(key, track(val)) for key, val in value.items()])
+        else:
+            list.extend(tracked, [track(val) for val in value])
+    return document
+
+
+def changing(method):
+    """
+    Return a wrapper of a dict or list `method` recording a change in the
+    document of a TrackedDict or TrackedList.
+    """
+
+    def changing_method(self, *args, **kwargs):
+        self.tracker.changed = True
+        return method(self, *args, **kwargs)
+
+    changing_method.__name__ = method.__name__
+    changing_method.__doc__ = method.__doc__
+    return changing_method
+
+
+class TrackedDict(dict):
+    """
+    A dict loaded with `track_changes` that records when it or any other
+    mapping or list of its document is modified. Copies are plain dicts.
+    """
+    __slots__ = ('tracker',)
+
+    @property
+    def changed(self):
+        return self.tracker.changed
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+    __setitem__ = changing(dict.__setitem__)
+    __delitem__ = changing(dict.__delitem__)
+    clear = changing(dict.clear)
+    pop = changing(dict.pop)
+    popitem = changing(dict.popitem)
+    setdefault = changing(dict.setdefault)
+    update = changing(dict.update)
+    if hasattr(dict, '__ior__'):
+        __ior__ = changing(dict.__ior__)
+
+
+class TrackedList(list):
+    """
+    A list loaded with `track_changes` that records when it or any other
+    mapping or list of its document is modified. Copies are plain lists.
+    """
+    __slots__ = ('tracker',)
+
+    @property
+    def changed(self):
+        return self.tracker.changed
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    __setitem__ = changing(list.__setitem__)
+    __delitem__ = changing(list.__delitem__)
+    __iadd__ = changing(list.__iadd__)
+    __imul__ = changing(list.__imul__)
+    append = changing(list.append)
+    clear = changing(list.clear)
+    extend = changing(list.extend)
+    insert = changing(list.insert)
+    pop = changing(list.pop)
+    remove = changing(list.remove)
+    reverse = changing(list.reverse)
+    sort = changing(list.sort)
+
+
+def get_shared(obj):
+    """
+    Return a copy of a loaded `obj` object where all mappings and lists are
+    replaced by FrozenDict and FrozenList and where equal mappings and lists
+    are the same shared object, or `obj` as-is if this is not a mapping or list.
+    Mappings are equal only if their keys are in the same order.
+
+    Raise an UnsupportedYamlFeatureError if `obj` contains itself through a
+    recursive alias.
+    """
+    if not isinstance(obj, (dict, list)):
+        return obj
+
+    # {(class, items or values): shared object} for each distinct subtree
+    subtrees = {}
+    # {id(object): shared object} such that aliased objects are shared too
+    objects = {}
+    # ids of the objects whose children are being shared
+    in_progress = set()
+    # stack of (object, children are shared)
+    stack = [(obj, False)]
+
+    while stack:
+        value, children_shared = stack.pop()
+        if id(value) in objects:
+            continue
+        is_mapping = isinstance(value, dict)
+        children = value.values() if is_mapping else value
+
+        if not children_shared:
+            in_progress.add(id(value))
+            stack.append((value, True))
+            for child in children:
+                if isinstance(child, (dict, list)):
+                    if id(child) in in_progress:
+                        raise UnsupportedYamlFeatureError(
+                            'Recursive alias cannot be loaded with share_subtrees')
+                    stack.append((child, False))
+            continue
+
+        if is_mapping:
+            frozen_class = FrozenDict
+            content = tuple(
+                (key, objects[id(val)] if isinstance(val, (dict, list)) else val)
+                for key, val in value.items()
+            )
+            identity = tuple((key, get_identity(val)) for key, val in content)
+        else:
+            frozen_class = FrozenList
+            content = tuple(
+                objects[id(val)] if isinstance(val, (dict, list)) else val
+                for val in value
+            )
+            identity = tuple(get_identity(val) for val in content)
+
+        key = frozen_class, identity
+        try:
+            shared = subtrees.get(key)
+        except TypeError:
+            # subtrees with unhashable values such as sets are not shared
+            key = shared = None
+        if shared is None:
+            shared = frozen_class(content)
+            if key is not None:
+                subtrees[key] = shared
+
+        objects[id(value)] = shared
+        in_progress.discard(id(value))
+
+    return objects[id(obj)]
+
+
+def get_identity(value):
+    """
+    Return a hashable identity of a `value` shared by `get_shared`. Shared
+    mappings and lists are identified by their object id such that mappings
+    with the same keys in a different order are not shared. Scalars are
+    identified by their type and value such that `1`, `1.0` and `True` are not
+    shared.
+    """
+    if isinstance(value, (FrozenDict, FrozenList)):
+        return None, id(value)
+    return type(value), value
+
+
+def read_only(self, *args, **kwargs):
+    """
+    Raise a TypeError for a method modifying a FrozenDict or FrozenList.
+    """
+    raise TypeError('{} is read-only'.format(self.__class__.__name__))
+
+
+class FrozenDict(dict):
+    """
+    A read-only and hashable dict loaded with `share_subtrees` that may be
+    shared by many mappings of its document. Pickled copies keep their shared
+    mappings and lists shared.
+    """
+    __slots__ = ('hash',)
+
+    def __hash__(self):
+        try:
+            return self.hash
+        except AttributeError:
+            self.hash = hash(frozenset(self.items()))
+            return self.hash
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    __setitem__ = read_only
+    __delitem__ = read_only
+    clear = read_only
+    pop = read_only
+    popitem = read_only
+    setdefault = read_only
+    update = read_only
+    if hasattr(dict, '__ior__'):
+        __ior__ = read_only
+
+
+class FrozenList(list):
+    """
+    A read-only and hashable list loaded with `share_subtrees` that may be
+    shared by many lists of its document. Pickled copies keep their shared
+    mappings and lists shared.
+    """
+    __slots__ = ('hash',)
+
+    def __hash__(self):
+        try:
+            return self.hash
+        except AttributeError:
+            self.hash = hash(tuple(self))
+            return self.hash
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+    __setitem__ = read_only
+    __delitem__ = read_only
+    __iadd__ = read_only
+    __imul__ = read_only
+    append = read_only
+    clear = read_only
+    extend = read_only
+    insert = read_only
+    pop = read_only
+    remove = read_only
+    reverse = read_only
+    sort = read_only
+
+
+# supported `records` load options
+RECORDS_OPTIONS = ('columnar',)
+
+
+def check_records(records):
+    """
+    Raise a ValueError if `records` is not a supported `records` load option.
+    """
+    if records not in RECORDS_OPTIONS:
+        raise ValueError(
+            'Unsupported records: {!r}. Use one of: {}'.format(records, ', '.join(RECORDS_OPTIONS)))
+
+
+def get_records(obj):
+    """
+    Return a copy of a loaded `obj` object where each list of two or more dicts
+    with the same keys in the same order is replaced by a RecordTable, or `obj`
+    as-is if this is not a mapping or list.
+
+    Raise an UnsupportedYamlFeatureError if `obj` contains itself through a
+    recursive alias.
+    """
+    if not isinstance(obj, (dict, list)):
+        return obj
+
+    # {id(object): converted object} such that aliased objects stay shared
+    objects = {}
+    # ids of the objects whose children are being converted
+    in_progress = set()
+    # stack of (object, children are converted)
+    stack = [(obj, False)]
+
+    while stack:
+        value, children_converted = stack.pop()
+        if id(value) in objects:
+            continue
+        is_mapping = isinstance(value, dict)
+        children = value.values() if is_mapping else value
+
+        if not children_converted:
+            in_progress.add(id(value))
+            stack.append((value, True))
+            for child in children:
+                if isinstance(child, (dict, list)):
+                    if id(child) in in_progress:
+                        raise UnsupportedYamlFeatureError(
+                            'Recursive alias cannot be loaded with records')
+                    stack.append((child, False))
+            continue
+
+        if is_mapping:
+            converted = {
+                key: objects[id(val)] if isinstance(val, (dict, list)) else val
+                for key, val in value.items()
+            }
+        else:
+            converted = [
+                objects[id(val)] if isinstance(val, (dict, list)) else val
+                for val in value
+            ]
+            fields = get_record_fields(converted)
+            if fields is not None:
+                converted = RecordTable(fields, converted)
+
+        objects[id(value)] = converted
+        in_progress.discard(id(value))
+
+    return objects[id(obj)]
+
+
+def get_record_fields(items):
+    """
+    Return a tuple of the keys of a list of `items` if these are two or more
+    dicts with the same keys in the same order or None otherwise.
+    """
+    if len(items) < 2:
+        return
+    first = items[0]
+    if type(first) is not dict:
+        return
+    fields = tuple(first)
+    for item in items:
+        if type(item) is not dict or len(item) != len(fields) or tuple(item) != fields:
+            return
+    return fields
+
+
+class RecordTable(Sequence):
+    """
+    A read-only list of mappings with the same `fields` keys loaded with
+    `records='columnar'`. Values are stored in one tuple per field rather than
+    in one dict per mapping and each item is returned as a Record mapping.
+    """
+    __slots__ = ('fields', 'positions', 'columns', 'size')
+
+    def __init__(self, fields, items):
+        self.fields = fields
+        # {field: column index}
+        self.positions = {field: position for position, field in enumerate(fields)}
+        self.columns = tuple(tuple(item[field] for item in items) for field in fields)
+        self.size = len(items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.size))]
+
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError('list index out of range')
+        return Record(self, index)
+
+    def __len__(self):
+        return self.size
+
+    def column(self, field):
+        """
+        Return a tuple of the values of a `field` for all the records.
+        """
+        return self.columns[self.positions[field]]
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, RecordTable)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'RecordTable({!r})'.format([dict(record) for record in self])
+
+
+class Record(Mapping):
+    """
+    A read-only mapping of the values at an `index` of a RecordTable `table`.
+    """
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, key):
+        table = self.table
+        return table.columns[table.positions[key]][self.index]
+
+    def __iter__(self):
+        return iter(self.table.fields)
+
+    def __len__(self):
+        return len(self.table.fields)
+
+    def __contains__(self, key):
+        return key in self.table.positions
+
+    def __repr__(self):
+        return 'Record({!r})'.format(dict(self.items()))
+
+
+###############################################################################
+# Dumping
+###############################################################################
+
+WIDTH = 90
+
+
+def dump(obj, indent=2, encoding=None):
+    """
+    Return a safe and sane YAML string representation from `obj`.
+    This is a unicode string if `encoding` is None.
+    Otherwise this is a byte string using the provided encoding.
+    The preferred encoding should be UTF-8 for bytes.
+    """
+    return dump_document(obj, stream=None, indent=indent, encoding=encoding)
+
+
+def dump_to(obj, stream, indent=2):
+    """
+    Write a safe and sane YAML representation from `obj` to a `stream` file
+    object opened in text or binary mode. Binary streams are written as UTF-8.
+    """
+    dump_document(obj, stream=stream, indent=indent, encoding=get_encoding(stream))
+
+
+def dump_all(objs, stream, indent=2):
+    """
+    Write a safe and sane YAML representation from each object of the `objs`
+    iterable as a multi-documents YAML to a `stream` file object opened in text
+    or binary mode. Binary streams are written as UTF-8.
+
+    Each document is written to the `stream` as it is emitted such that only
+    one object at a time is needed in memory.
+
+    Documents start with an explicit --- marker except for a first document
+    that is a mapping or a list: the end marker written after a top-level
+    scalar cannot start a stream.
+    """
+    encoding = get_encoding(stream)
+    for i, obj in enumerate(objs):
+        dump_document(
+            obj,
+            stream=stream,
+            indent=indent,
+            encoding=encoding,
+            explicit_start=i > 0 or not isinstance(obj, (dict, list)),
+        )
+
+
+def dump_table(rows, columns=None, indent=2, encoding=None):
+    """
+    Return a safe and sane YAML string representation from a `rows` list of
+    mappings, dumping only the `columns` keys of each mapping in this order.
+    `columns` defaults to the keys of the first mapping. A KeyError is raised
+    if a mapping does not have one of the `columns` keys.
+
+    This is the same as dumping a list of mappings of these `columns` with
+    `dump` but faster for a large list: the style of the string values is
+    decided once for each distinct value of a column and once for a whole
+    column when all its values use the same style.
+    """
+    table = Table(rows, columns)
+    return dump_document(table, stream=None, indent=indent, encoding=encoding)
+
+
+def dump_file(obj, location, indent=2, only_if_changed=False):
+    """
+    Write a safe and sane YAML representation from `obj` to a UTF-8 file at
+    `location`. The YAML is written as it is emitted to a temporary file in the
+    same directory that is then atomically renamed to `location` such that
+    `location` is never left with a partial content. Return True if the file
+    was written.
+
+    If `only_if_changed` is True, the YAML is first emitted to compute its size
+    and hash without keeping it in memory, and the file is not written and
+    False is returned if it already exists with the same size and the same
+    content hash, computed by reading it in chunks.
+
+    If `obj` is an unmodified document loaded with `track_changes` and the file
+    at `location` still contains the YAML it was loaded from, the file is not
+    written and False is returned without dumping `obj`.
+    """
+    location = os.path.abspath(location)
+    if (
+        isinstance(obj, (TrackedDict, TrackedList))
+        and obj.tracker.is_unchanged_in(obj, location)
+    ):
+        return False
+
+    if only_if_changed and os.path.exists(location):
+        hashing_stream = HashingStream()
+        dump_to(obj, hashing_stream, indent=indent)
+        if (
+            hashing_stream.size == os.path.getsize(location)
+            and hashing_stream.hexdigest() == get_file_sha1(location)
+        ):
+            return False
+
+    temp_location = '{}.{}.tmp'.format(location, uuid.uuid4().hex)
+    # create the file like `open` does using the umask
+    fd = os.open(temp_location, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with io.open(fd, 'wb') as stream:
+            dump_to(obj, stream, indent=indent)
+        if os.path.exists(location):
+            shutil.copymode(location, temp_location)
+        os.replace(temp_location, location)
+    except BaseException:
+        if os.path.exists(temp_location):
+            os.remove(temp_location)
+        raise
+    return True
+
+
+class Table(object):
+    """
+    A `rows` list of mappings to dump as a list of mappings of their `columns`
+    keys with the TableColumn styles of each of the `columns` keys.
+    """
+    __slots__ = ('rows', 'columns')
+
+    def __init__(self, rows, columns=None):
+        if not isinstance(rows, Sequence):
+            rows = list(rows)
+        if columns is None:
+            columns = list(rows[0]) if rows else []
+        self.rows = rows
+        self.columns = [
+            TableColumn(key, [row[key] for row in rows])
+            for key in columns
+        ]
+
+    def is_c_dumpable(self, indent=2, width=WIDTH):
+        """
+        Return True if the libyaml C emitter dumps this table exactly as the
+        SaneDumper does, checking each distinct value of each column once.
+        """
+        if not self.rows:
+            return False
+        for column in self.columns:
+            if column.nested:
+                return False
+            key = get_scalar_text(column.key)
+            if not key or not is_c_printable(key):
+                return False
+            key_length = get_quoted_length(key)
+            if 2 * indent + key_length + 4 > width:
+                return False
+            for value in list(column.styles) + list(column.others):
+                if not is_c_dumpable_scalar(value, 2, key_length, indent, width):
+                    return False
+        return True
+
+
+class TableColumn(object):
+    """
+    The styles of the string `values` of a Table column `key`. The style of
+    each distinct string value is stored in `styles` and `style` is the style
+    of all the values if they all use the same style or MIXED_STYLES.
+    """
+    __slots__ = ('key', 'style', 'styles', 'others', 'nested')
+
+    def __init__(self, key, values):
+        self.key = key
+        # {string value: style}
+        self.styles = styles = {}
+        # distinct scalar values that are not strings
+        self.others = others = set()
+        # True if some values are mappings, lists or other objects
+        self.nested = False
+
+        for value in values:
+            if type(value) is str:
+                if value not in styles:
+                    styles[value] = get_style(value)
+            elif value is None or isinstance(value, (bool, int, float, bytes)):
+                others.add(value)
+            else:
+                self.nested = True
+
+        distinct_styles = set(styles.values())
+        if len(distinct_styles) == 1:
+            self.style = distinct_styles.pop()
+        else:
+            self.style = MIXED_STYLES
 
-# Load most types as strings : nulls, ints, (such as in version 01) floats (such
-# as version 2.20) and timestamps conversion (in versions too), booleans are all
-# loaded as plain strings.
-# This avoid unwanted type conversions for unquoted strings and the resulting
-# content damaging. This overrides the implicit resolvers. Callers must handle
-# type conversion explicitly from unicode to other types in the loaded objects.
-# NOTE: we are still using the built-in loader for booleans. It will recognize
-# yes/no as a boolean.
-BaseSaneLoader.add_constructor('tag:yaml.org,2002:str', BaseSaneLoader.string_loader)
-BaseSaneLoader.add_constructor('tag:yaml.org,2002:null', BaseSaneLoader.string_loader)
-BaseSaneLoader.add_constructor('tag:yaml.org,2002:boolean', BaseSaneLoader.string_loader)
-BaseSaneLoader.add_constructor('tag:yaml.org,2002:timestamp', BaseSaneLoader.string_loader)
-BaseSaneLoader.add_constructor('tag:yaml.org,2002:float', BaseSaneLoader.string_loader)
-BaseSaneLoader.add_constructor('tag:yaml.org,2002:int', BaseSaneLoader.string_loader)
-BaseSaneLoader.add_constructor('tag:yaml.org,2002:null', BaseSaneLoader.string_loader)
-# Fall back to mapping for anything else, e.g. ignore tags such as
-# !!Python, ruby and other dangerous mappings: treat them as a mapping
-BaseSaneLoader.add_constructor(None, BaseSaneLoader.ordered_loader)
 
+# The TableColumn style of a column with values using different styles
+MIXED_STYLES = object()
 
-class SaneLoader(BaseSaneLoader):
-    pass
 
+class HashingStream(object):
+    """
+    A binary stream that computes the SHA1 hash and size of the bytes written
+    to it without storing them.
+    """
 
-# Always load mapping as ordered mappings
-SaneLoader.add_constructor('tag:yaml.org,2002:map', BaseSaneLoader.ordered_loader)
-SaneLoader.add_constructor('tag:yaml.org,2002:omap', BaseSaneLoader.ordered_loader)
+    def __init__(self):
+        self.sha1 = hashlib.sha1()
+        self.size = 0
 
+    def write(self, data):
+        self.sha1.update(data)
+        self.size += len(data)
 
-class DupeKeySaneLoader(BaseSaneLoader):
+    def hexdigest(self):
+        return self.sha1.hexdigest()
+
+
+def get_file_sha1(location, chunk_size=64 * 1024):
     """
-    A variant that check that maps do not contain duplicate keys.
-    Raise DuplicateYamlMappingKeyError on duplicate.
+    Return the SHA1 hex digest of the file at `location` read by chunks of
+    `chunk_size` bytes.
     """
-    pass
+    sha1 = hashlib.sha1()
+    with io.open(location, 'rb') as inp:
+        for chunk in iter(partial(inp.read, chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
 
 
-# Always load mapping as ordered mappings
-dupe_checkding_ordered_loader = partial(BaseSaneLoader.ordered_loader, check_dupe=True)
-DupeKeySaneLoader.add_constructor('tag:yaml.org,2002:map', dupe_checkding_ordered_loader)
-DupeKeySaneLoader.add_constructor('tag:yaml.org,2002:omap', dupe_checkding_ordered_loader)
+def dump_many(objs, indent=2, workers=None, chunk_size=16):
+    """
+    Return a list of safe and sane YAML strings from each object of the `objs`
+    iterable in the same order as `objs`.
 
-###############################################################################
-# Dumping
-###############################################################################
+    Objects are dumped in parallel in a pool of `workers` processes by chunks
+    of `chunk_size` objects. `workers` defaults to the number of CPUs. If
+    `workers` is 1 or less, objects are dumped sequentially in the current
+    process. The first Exception raised when dumping an object is re-raised.
+    """
+    dumper = partial(dump, indent=indent)
+    return parallel_map(dumper, objs, workers=workers, chunk_size=chunk_size)
 
-WIDTH = 90
 
+def dump_many_files(objs, locations, indent=2, workers=None, chunk_size=16):
+    """
+    Write a safe and sane YAML representation from each object of the `objs`
+    iterable to the UTF-8 file at the corresponding location of the `locations`
+    iterable using `dump_file`.
 
-def dump(obj, indent=2, encoding=None):
+    Objects are dumped in parallel in a pool of `workers` processes by chunks
+    of `chunk_size` objects. `workers` defaults to the number of CPUs. If
+    `workers` is 1 or less, objects are dumped sequentially in the current
+    process. The first Exception raised when dumping an object is re-raised.
     """
-    Return a safe and sane YAML string representation from `obj`.
-    This is a unicode string if `encoding` is None.
-    Otherwise this is a byte string using the provided encoding.
-    The preferred encoding should be UTF-8 for bytes.
+    dumper = partial(dump_file, indent=indent)
+    parallel_map(dumper, objs, locations, workers=workers, chunk_size=chunk_size)
+
+
+def get_encoding(stream):
+    """
+    Return the encoding to use to write YAML to a `stream` file object: None
+    for text streams or UTF-8 for binary streams.
+    """
+    if isinstance(stream, io.TextIOBase):
+        return
+    return 'utf-8'
+
+
+def dump_document(obj, stream=None, indent=2, encoding=None, explicit_start=False):
+    """
+    Write a safe and sane YAML representation from `obj` to a `stream` or
+    return it if `stream` is None using the `encoding` (or unicode if None).
+    Start the document with an explicit --- marker if `explicit_start` is True.
+    """
+    if CSaneDumper and is_c_encoding(encoding) and is_c_dumpable(obj, indent=indent):
+        dumper = CSaneDumper
+    else:
+        dumper = SaneDumper
+
+    options = get_dump_options(indent=indent, encoding=encoding, explicit_start=explicit_start)
+    if instruments:
+        return dump_instrumented(obj, stream, dumper, options)
+    return yaml.dump(data=obj, stream=stream, Dumper=dumper, **options)
+
+
+def is_c_encoding(encoding):
+    """
+    Return True if the libyaml C emitter can dump using `encoding`: it only
+    writes unicode or UTF-8, while the Python emitter supports any encoding.
+    """
+    return encoding is None or codecs.lookup(encoding).name == 'utf-8'
+
+
+def get_dump_options(indent=2, encoding=None, explicit_start=False):
     """
-    return yaml.dump(
-        data=obj,
-        Dumper=SaneDumper,
+    Return a mapping of Dumper options.
+    """
+    return dict(
         # no flow, only block and minimal styling
         default_flow_style=False,
         default_style=None,
@@ -166,8 +2562,8 @@ def dump(obj, indent=2, encoding=None):
         width=WIDTH,
         # posix LF
         line_break='\n',
-        # no --- and ...
-        explicit_start=False,
+        # no --- and ... unless requested for multiple documents
+        explicit_start=explicit_start,
         explicit_end=False,
     )
 
@@ -184,7 +2580,130 @@ class IndentingEmitter(Emitter):
         )
 
 
-class SaneDumper(IndentingEmitter, Serializer, SafeRepresenter, Resolver):
+class SaneRepresenter(SafeRepresenter):
+    """
+    A safe representer shared by the Python and C dumpers.
+    """
+
+    def ignore_aliases(self, data):
+        """
+        Avoid having aliases created from re-used Python objects or else.
+        """
+        return True
+
+    def ordered_dumper(self, data):
+        """
+        Ensure that maps are always dumped in the items order.
+        """
+        return self.represent_mapping('tag:yaml.org,2002:map', data.items(), flow_style=False)
+
+    def null_dumper(self, value):  # NOQA
+        """
+        Always dump nulls as empty string.
+        """
+        return self.represent_scalar('tag:yaml.org,2002:str', '', style=None)
+
+    def string_dumper(self, value):
+        """
+        Ensure that all scalars are dumped as UTF-8 unicode, folded and quoted
+        in the sanest and most readable way.
+        """
+        tag = 'tag:yaml.org,2002:str'
+
+        if value is None:
+            return ''
+
+        if isinstance(value, bool):
+            value = 'yes' if value else 'no'
+            style = get_style(value, default='')
+
+        elif isinstance(value, int):
+            value = str(value)
+            style = get_style(value, default='')
+
+        elif isinstance(value, float):
+            value = repr(value)
+            style = get_style(value, default="'")
+
+        else:
+            if isinstance(value, bytes):
+                value = value.decode('utf-8')
+            elif not isinstance(value, str):
+                value = repr(value)
+
+            if len(value) <= STYLE_CACHE_MAX_LENGTH:
+                style = get_cached_style(value)
+            else:
+                style = get_style(value)
+
+        return self.represent_scalar(tag, value, style=style)
+
+    def table_dumper(self, table):
+        """
+        Dump a Table as a list of mappings using the precomputed styles of each
+        of its columns for the string values and the representers otherwise.
+        """
+        str_tag = 'tag:yaml.org,2002:str'
+        flow_style = self.default_flow_style
+        represent_data = self.represent_data
+
+        columns = []
+        for column in table.columns:
+            key = column.key
+            is_str_key = type(key) is str
+            key_style = get_style(key) if is_str_key else None
+            style = column.style
+            styles = column.styles if style is MIXED_STYLES else None
+            columns.append((key, is_str_key, key_style, style, styles))
+
+        items = []
+        for row in table.rows:
+            pairs = []
+            for key, is_str_key, key_style, style, styles in columns:
+                if is_str_key:
+                    key_node = ScalarNode(str_tag, key, style=key_style)
+                else:
+                    key_node = represent_data(key)
+
+                value = row[key]
+                if type(value) is str:
+                    if styles is not None:
+                        style = styles[value]
+                    value_node = ScalarNode(str_tag, value, style=style)
+                else:
+                    value_node = represent_data(value)
+                pairs.append((key_node, value_node))
+            items.append(MappingNode('tag:yaml.org,2002:map', pairs, flow_style=False))
+        return SequenceNode('tag:yaml.org,2002:seq', items, flow_style=flow_style)
+
+    def boolean_dumper(self, value):
+        """
+        Dump booleans as yes or no strings.
+        They will be loaded back as boolean by default alright.
+        """
+        value = 'yes' if value else 'no'
+        return self.represent_scalar('tag:yaml.org,2002:bool', value, style=None)
+
+
+SaneRepresenter.add_representer(int, SaneRepresenter.string_dumper)
+SaneRepresenter.add_representer(dict, SaneRepresenter.ordered_dumper)
+SaneRepresenter.add_representer(type(None), SaneRepresenter.null_dumper)
+SaneRepresenter.add_representer(bool, SaneRepresenter.string_dumper)
+SaneRepresenter.add_representer(bytes, SaneRepresenter.string_dumper)
+SaneRepresenter.add_representer(str, SaneRepresenter.string_dumper)
+SaneRepresenter.add_representer(float, SaneRepresenter.string_dumper)
+SaneRepresenter.add_representer(LazyMapping, SaneRepresenter.ordered_dumper)
+SaneRepresenter.add_representer(LazySequence, SaneRepresenter.represent_list)
+SaneRepresenter.add_representer(TrackedDict, SaneRepresenter.ordered_dumper)
+SaneRepresenter.add_representer(TrackedList, SaneRepresenter.represent_list)
+SaneRepresenter.add_representer(FrozenDict, SaneRepresenter.ordered_dumper)
+SaneRepresenter.add_representer(FrozenList, SaneRepresenter.represent_list)
+SaneRepresenter.add_representer(RecordTable, SaneRepresenter.represent_list)
+SaneRepresenter.add_representer(Record, SaneRepresenter.ordered_dumper)
+SaneRepresenter.add_representer(Table, SaneRepresenter.table_dumper)
+
+
+class SaneDumper(IndentingEmitter, Serializer, SaneRepresenter, Resolver):
 
     def __init__(self, stream,
         default_style=None,
@@ -219,7 +2738,7 @@ class SaneDumper(IndentingEmitter, Serializer, SafeRepresenter, Resolver):
             version=version,
             tags=tags,
         )
-        SafeRepresenter.__init__(
+        SaneRepresenter.__init__(
             self,
             default_style=default_style,
             default_flow_style=default_flow_style,
@@ -232,87 +2751,239 @@ class SaneDumper(IndentingEmitter, Serializer, SafeRepresenter, Resolver):
         """
         return ''
 
-    def ignore_aliases(self, data):
-        """
-        Avoid having aliases created from re-used Python objects or else.
-        """
-        return True
 
-    def ordered_dumper(self, data):
-        """
-        Ensure that maps are always dumped in the items order.
-        """
-        return self.represent_mapping('tag:yaml.org,2002:map', data.items(), flow_style=False)
+SaneDumper.yaml_implicit_resolvers = {}
+SaneDumper.yaml_path_resolvers = {}
 
-    def null_dumper(self, value):  # NOQA
-        """
-        Always dump nulls as empty string.
-        """
-        return self.represent_scalar('tag:yaml.org,2002:str', '', style=None)
+if CEmitter:
 
-    def string_dumper(self, value):
+    class CSaneDumper(CEmitter, SaneRepresenter, Resolver):
         """
-        Ensure that all scalars are dumped as UTF-8 unicode, folded and quoted
-        in the sanest and most readable way.
+        A dumper using the libyaml C emitter with the same representers as the
+        SaneDumper. libyaml does not indent lists in mappings and adds block
+        hints to literals: only use it for objects where `is_c_dumpable` is True.
         """
-        tag = 'tag:yaml.org,2002:str'
-        style = None
 
-        if value is None:
-            return ''
+        def __init__(self, stream,
+            default_style=None,
+            default_flow_style=None,
+            canonical=None,
+            indent=None,
+            width=None,
+            allow_unicode=None,
+            line_break=None,
+            encoding=None,
+            explicit_start=None,
+            explicit_end=None,
+            version=None,
+            tags=None,
+            sort_keys=False,
+            **kwargs,
+        ):
+            CEmitter.__init__(
+                self,
+                stream,
+                canonical=canonical,
+                indent=indent,
+                width=width,
+                encoding=encoding,
+                allow_unicode=allow_unicode,
+                line_break=line_break,
+                explicit_start=explicit_start,
+                explicit_end=explicit_end,
+                version=version,
+                tags=tags,
+            )
+            SaneRepresenter.__init__(
+                self,
+                default_style=default_style,
+                default_flow_style=default_flow_style,
+            )
+            Resolver.__init__(self)
 
-        if isinstance(value, bool):
-            value = 'yes' if value else 'no'
-            style = ''
+    CSaneDumper.yaml_implicit_resolvers = {}
+    CSaneDumper.yaml_path_resolvers = {}
 
-        if isinstance(value, float):
-            style = "'"
+else:  # pragma: nocover
+    CSaneDumper = None
 
-        if isinstance(value, int):
-            value = str(value)
-            style = ''
 
-        if isinstance(value, bytes):
-            value = value.decode('utf-8')
-        elif isinstance(value, int):
-            value = str(value)
-        elif not isinstance(value, str):
-            value = repr(value)
+def get_scalar_text(value):
+    """
+    Return the text that the SaneRepresenter dumps for a scalar `value` or None
+    if `value` is not a scalar.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, bytes):
+        try:
+            return value.decode('utf-8')
+        except UnicodeDecodeError:
+            return
 
-        # do not quote integer strings
-        if value.isdigit():
-            if value.lstrip('0') == value:
-                style = ''
-            else:
-                # things such as 012 needs to be quoted
-                style = "'"
 
-        # quote things that could be mistakenly loaded as date
-        if is_iso_date(value):
-            style = "'"
+def is_c_dumpable(obj, indent=2, width=WIDTH):
+    """
+    Return True if the libyaml C emitter dumps `obj` exactly as the SaneDumper
+    does. This is the case when:
+
+    - `obj` is a mapping or a list: the Python emitter may add an extra document
+      end marker after a top level scalar,
+    - no list is the value of a mapping: libyaml does not indent these,
+    - all scalars are printable single lines short enough to never be folded
+      or are literals that libyaml dumps without block hints,
+    - all mapping keys are non-empty scalars.
+    """
+    if isinstance(obj, Table):
+        return obj.is_c_dumpable(indent=indent, width=width)
+    if not isinstance(obj, (dict, list)):
+        return False
 
-        # quote things that could be mistakenly loaded as float such as version numbers
-        if value != '.' and len(value.split('.')) == 2 and all(c in '0123456789.' for c in value):
-            style = "'"
+    # a stack of (object, nesting depth, key text length)
+    stack = [(obj, 0, 0)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        value, depth, key_length = pop()
 
-        elif value == 'null':
-            style = "'"
+        if isinstance(value, dict):
+            for key, val in value.items():
+                key = get_scalar_text(key)
+                if not key or not is_c_printable(key):
+                    return False
+                if (depth + 1) * indent + get_quoted_length(key) + 4 > width:
+                    return False
+                if isinstance(val, list):
+                    return False
+                push((val, depth + 1, get_quoted_length(key)))
 
-        # if '\n' in value or len(value) > WIDTH:
-            # literal_style for multilines or long
-        elif '\n' in value:
-            # literal_style for multilines
-            style = '|'
+        elif isinstance(value, list):
+            for val in value:
+                push((val, depth + 1, 0))
 
-        return self.represent_scalar(tag, value, style=style)
+        elif not is_c_dumpable_scalar(value, depth, key_length, indent, width):
+            return False
 
-    def boolean_dumper(self, value):
-        """
-        Dump booleans as yes or no strings.
-        They will be loaded back as boolean by default alright.
-        """
-        value = 'yes' if value else 'no'
-        return self.represent_scalar('tag:yaml.org,2002:bool', value, style=None)
+    return True
+
+
+def is_c_dumpable_scalar(value, depth, key_length, indent=2, width=WIDTH):
+    """
+    Return True if the libyaml C emitter dumps a scalar `value` exactly as the
+    SaneDumper does at a nesting `depth` as the value of a key of quoted
+    `key_length` or as a list item if `key_length` is 0.
+    """
+    text = get_scalar_text(value)
+    if text is None:
+        return False
+    if '\n' in text:
+        return is_c_dumpable_literal(text)
+    if not is_c_printable(text):
+        return False
+    return (depth + 1) * indent + key_length + get_quoted_length(text) + 4 <= width
+
+
+def get_quoted_length(text):
+    """
+    Return the worst case length of a printable `text` once quoted and escaped.
+    """
+    return len(text) + text.count('"') + text.count('\\') + text.count("'") + 2
+
+
+# Match characters above U+FFFF that libyaml escapes and the Python emitter does
+# not
+has_non_bmp = re.compile('[\U00010000-\U0010FFFF]').search
+
+
+def is_c_printable(text):
+    """
+    Return True if `text` is printable and written as-is by both the libyaml C
+    emitter and the Python emitter.
+    """
+    return text.isprintable() and not has_non_bmp(text)
+
+
+def is_c_dumpable_literal(text):
+    """
+    Return True if the multiline `text` is dumped as a literal without block
+    hints by libyaml: it must end with a single new line, not start with a
+    space and have no trailing spaces in its lines.
+    """
+    return (
+        text.endswith('\n')
+        and not text.endswith('\n\n')
+        and not text.startswith((' ', '\n'))
+        and ' \n' not in text
+        and not is_iso_date(text)
+        and is_c_printable(text.replace('\n', ''))
+    )
+
+
+# Maximum number of cached string styles
+STYLE_CACHE_SIZE = 8192
+
+# Maximum length of a string to cache its style: longer strings are typically
+# unique texts that would only evict the commonly repeated short values
+STYLE_CACHE_MAX_LENGTH = 100
+
+
+# Match strings that need a specific style using a single regex match:
+# - quoted: things that could be mistakenly loaded as a float such as version
+#   numbers, as a date or as a null
+# - digits: strings of word characters that may be integer strings
+# Multilines strings are handled before using this pattern.
+get_style_match = re.compile(
+    r'(?P<quoted>'
+        r'(?!\.\Z)[0-9]*\.[0-9]*\Z'
+        r'|null\Z'
+        r'|(?:19|20)[0-9]{2}-[0-1][0-9]-[0-3][0-9]'
+    r')'
+    r'|(?P<digits>\w+\Z)'
+).match
+
+
+def get_style(value, default=None):
+    """
+    Return the YAML scalar style to use to dump the `value` string or the
+    `default` style.
+    """
+    if '\n' in value:
+        # literal_style for multilines
+        return '|'
+
+    match = get_style_match(value)
+    if not match:
+        return default
+
+    if match.lastgroup == 'quoted':
+        return "'"
+
+    # do not quote integer strings
+    if value.isdigit():
+        if value.startswith('0'):
+            # things such as 012 needs to be quoted
+            return "'"
+        return ''
+
+    return default
+
+
+@lru_cache(maxsize=STYLE_CACHE_SIZE)
+def get_cached_style(value):
+    """
+    Return the YAML scalar style to use to dump the `value` string using a
+    least recently used cache of styles. Use `get_cached_style.cache_info()`
+    to get the cache hits and misses counts.
+    """
+    return get_style(value)
 
 
 def is_float(s):
@@ -329,13 +3000,194 @@ def is_float(s):
 # Return True if s is an iso date such as `2019-12-12`
 is_iso_date = re.compile(r'(19|20)[0-9]{2}-[0-1][0-9]-[0-3][0-9]').match
 
-SaneDumper.add_representer(int, SaneDumper.string_dumper)
-SaneDumper.add_representer(dict, SaneDumper.ordered_dumper)
-SaneDumper.add_representer(type(None), SaneDumper.null_dumper)
-SaneDumper.add_representer(bool, SaneDumper.string_dumper)
-SaneDumper.add_representer(bytes, SaneDumper.string_dumper)
-SaneDumper.add_representer(str, SaneDumper.string_dumper)
-SaneDumper.add_representer(float, SaneDumper.string_dumper)
 
-SaneDumper.yaml_implicit_resolvers = {}
-SaneDumper.yaml_path_resolvers = {}
+###############################################################################
+# Instrumentation
+###############################################################################
+
+# Callbacks called with the statistics of each load and dump
+instruments = []
+
+
+@contextmanager
+def instrument(callback):
+    """
+    Return a context manager that calls `callback` with a mapping of statistics
+    for each `load`, `load_file` and `dump` call made in the context, including
+    from other threads. The `dump_to`, `dump_all` and `dump_file` functions
+    call `callback` for each dumped document.
+
+    The statistics mapping contains:
+    - operation: either "load" or "dump".
+    - timings: a mapping of {phase: seconds} for the scan, parse, compose and
+      construct phases of a load or the represent, serialize and emit phases
+      of a dump.
+    - counts: a mapping of {name: count} of the tokens (for a load), events,
+      scalars, mappings, sequences and aliases.
+    - bytes_in: the size in bytes of the loaded YAML or 0 for a dump.
+    - bytes_out: the size in bytes of the dumped YAML or 0 for a load.
+
+    Each phase runs separately to time it, such that instrumented calls are
+    slower. On load, the scanner, parser and composer run lazily one within the
+    other: the parse time includes scanning and the compose time includes
+    scanning and parsing. With libyaml the scan time also includes creating the
+    Python tokens that are not created when parsing, and may exceed the parse
+    time. Without instrumentation, the only overhead is to check for callbacks.
+    """
+    instruments.append(callback)
+    try:
+        yield
+    finally:
+        instruments.remove(callback)
+
+
+def call_instruments(stats):
+    for callback in list(instruments):
+        callback(stats)
+
+
+def count_events(events, counts):
+    """
+    Update the `counts` mapping with the counts of scalars, mappings, sequences
+    and aliases from an `events` iterable of events.
+    """
+    for event in events:
+        counts['events'] += 1
+        event_class = event.__class__
+        if event_class is ScalarEvent:
+            counts['scalars'] += 1
+        elif event_class is MappingStartEvent:
+            counts['mappings'] += 1
+        elif event_class is SequenceStartEvent:
+            counts['sequences'] += 1
+        elif event_class is AliasEvent:
+            counts['aliases'] += 1
+
+
+def load_instrumented(s, loader_class, intern_table=None):
+    """
+    Return an object loaded from a single document YAML string or stream `s`
+    using a `loader_class` Loader class and an optional `intern_table`
+    InternTable, timing each load phase separately and calling the
+    instrumentation callbacks.
+    """
+    if not isinstance(s, (str, bytes)):
+        s = s.read()
+    timer = time.perf_counter
+    counts = dict(tokens=0, events=0, scalars=0, mappings=0, sequences=0, aliases=0)
+
+    start = timer()
+    loader = loader_class(s)
+    try:
+        get_token = loader.get_token
+        while get_token() is not None:
+            counts['tokens'] += 1
+    finally:
+        loader.dispose()
+    scanned = timer() - start
+
+    start = timer()
+    loader = loader_class(s)
+    try:
+        get_event = loader.get_event
+        count_events(iter(get_event, None), counts)
+    finally:
+        loader.dispose()
+    parsed = timer() - start
+
+    loader = loader_class(s)
+    loader.intern_table = intern_table
+    try:
+        start = timer()
+        node = loader.get_single_node()
+        composed = timer() - start
+
+        start = timer()
+        data = None if node is None else loader.construct_document(node)
+        constructed = timer() - start
+    finally:
+        loader.dispose()
+
+    call_instruments(dict(
+        operation='load',
+        timings=dict(
+            scan=scanned,
+            parse=parsed,
+            compose=composed,
+            construct=constructed,
+        ),
+        counts=counts,
+        bytes_in=len(s.encode('utf-8')) if isinstance(s, str) else len(s),
+        bytes_out=0,
+    ))
+    return data
+
+
+class CountingStream(object):
+    """
+    Wrap a `stream` to count the UTF-8 bytes written to it.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data.encode('utf-8')) if isinstance(data, str) else len(data)
+        return self.stream.write(data)
+
+    def __getattr__(self, name):
+        # the libyaml emitter writes unicode if the stream has an encoding
+        return getattr(self.stream, name)
+
+
+def dump_instrumented(obj, stream, dumper_class, options):
+    """
+    Write a YAML representation from `obj` to a `stream` or return it if
+    `stream` is None using a `dumper_class` Dumper class with `options`,
+    timing each dump phase separately and calling the instrumentation
+    callbacks.
+    """
+    timer = time.perf_counter
+    getvalue = None
+    if stream is None:
+        stream = io.StringIO() if options['encoding'] is None else io.BytesIO()
+        getvalue = stream.getvalue
+    stream = CountingStream(stream)
+
+    dumper = dumper_class(stream, **options)
+    try:
+        start = timer()
+        node = dumper.represent_data(obj)
+        represented = timer() - start
+
+        # serialize with the Python serializer as the libyaml emitter
+        # serializes and emits at once
+        events = []
+        serializer = SaneDumper(None, **options)
+        serializer.emit = events.append
+        start = timer()
+        serializer.open()
+        serializer.serialize(node)
+        serializer.close()
+        serialized = timer() - start
+
+        start = timer()
+        emit = dumper.emit
+        for event in events:
+            emit(event)
+        emitted = timer() - start
+    finally:
+        dumper.dispose()
+
+    counts = dict(events=0, scalars=0, mappings=0, sequences=0, aliases=0)
+    count_events(events, counts)
+    call_instruments(dict(
+        operation='dump',
+        timings=dict(represent=represented, serialize=serialized, emit=emitted),
+        counts=counts,
+        bytes_in=0,
+        bytes_out=stream.size,
+    ))
+    if getvalue:
+        return getvalue()
@@ -12,8 +12,14 @@
 import io
 import json
 import os
+import pickle
 import re
+import tempfile
+import time
 from unittest.case import TestCase
+from unittest import skipIf
+
+import yaml
 
 import saneyaml
 
@@ -137,6 +143,880 @@ that: *environ
         ])
         assert  expected == result
 
+    def test_iter_load_yields_each_document(self):
+        test = '''
+a: 12
+b: [1, 2]
+---
+- null
+- 2012-03-12
+---
+c: d
+'''
+        result = saneyaml.iter_load(test)
+        assert not isinstance(result, list)
+        expected = [
+            {'a': '12', 'b': ['1', '2']},
+            ['null', '2012-03-12'],
+            {'c': 'd'},
+        ]
+        assert expected == list(result)
+
+    def test_iter_load_reads_file_objects_incrementally(self):
+        test = ''.join('---\nname: doc{}\ntext: {}\n'.format(i, 'x' * 100) for i in range(2000))
+        stream = io.BytesIO(test.encode('utf-8'))
+        documents = saneyaml.iter_load(stream)
+        assert {'name': 'doc0', 'text': 'x' * 100} == next(documents)
+        assert stream.tell() < len(test)
+        assert 1999 == len(list(documents))
+
+    def test_iter_load_optionally_raise_exception_on_dupe(self):
+        test = io.StringIO('a: 1\n---\na: 1\nb: 2\na: 3\n')
+        documents = saneyaml.iter_load(test, allow_duplicate_keys=False)
+        assert {'a': '1'} == next(documents)
+        try:
+            next(documents)
+            self.fail('Exception not raised')
+        except saneyaml.UnsupportedYamlFeatureError as e:
+            assert 'Duplicate key in YAML source: a' == str(e)
+
+    def test_dump_to_writes_to_text_and_binary_streams(self):
+        test = {'a': ['b', 12], 'c': 'some\nlines\n'}
+        expected = saneyaml.dump(test)
+
+        text_stream = io.StringIO()
+        saneyaml.dump_to(test, text_stream)
+        assert expected == text_stream.getvalue()
+
+        binary_stream = io.BytesIO()
+        saneyaml.dump_to(test, binary_stream)
+        assert expected.encode('utf-8') == binary_stream.getvalue()
+
+    def test_dump_all_writes_multiple_documents(self):
+        test = [
+            {'a': 'b'},
+            {'c': ['d', None]},
+            ['1.0', '012'],
+            {'é': 'some\nlines\n'},
+        ]
+        expected = (
+            "a: b\n"
+            "---\n"
+            "c:\n"
+            "  - d\n"
+            "  -\n"
+            "---\n"
+            "- '1.0'\n"
+            "- '012'\n"
+            "---\n"
+            "é: |\n"
+            "  some\n"
+            "  lines\n"
+        )
+        text_stream = io.StringIO()
+        saneyaml.dump_all(iter(test), text_stream)
+        assert expected == text_stream.getvalue()
+
+        binary_stream = io.BytesIO()
+        saneyaml.dump_all(iter(test), binary_stream)
+        assert expected.encode('utf-8') == binary_stream.getvalue()
+
+        binary_stream.seek(0)
+        expected_load = [
+            {'a': 'b'},
+            {'c': ['d', '']},
+            ['1.0', '012'],
+            {'é': 'some\nlines\n'},
+        ]
+        assert expected_load == list(saneyaml.iter_load(binary_stream))
+
+    def test_dump_all_with_scalar_documents_can_be_loaded_with_iter_load(self):
+        for test in (
+            [None, {'a': 'b'}],
+            ['a', None, {'a': 'b'}, '1.0', []],
+            [{'a': 'b'}, None, 'c'],
+        ):
+            stream = io.StringIO()
+            saneyaml.dump_all(test, stream)
+            expected = [('' if doc is None else doc) for doc in test]
+            assert expected == list(saneyaml.iter_load(stream.getvalue()))
+
+    def test_get_style(self):
+        assert None is saneyaml.get_style('foo')
+        assert '' is saneyaml.get_style('foo', default='')
+        assert '' == saneyaml.get_style('12')
+        assert "'" == saneyaml.get_style('012')
+        assert "'" == saneyaml.get_style('0')
+        assert "'" == saneyaml.get_style('2019-12-12')
+        assert "'" == saneyaml.get_style('1.20')
+        assert "'" == saneyaml.get_style('null')
+        assert '|' == saneyaml.get_style('some\nlines')
+        assert None is saneyaml.get_style('.')
+        assert None is saneyaml.get_style('1.2.3')
+
+    def test_dump_caches_repeated_string_styles(self):
+        saneyaml.get_cached_style.cache_clear()
+        test = [{'license': 'mit', 'flag': 'yes'}] * 3
+        test.append({'text': 'x' * (saneyaml.STYLE_CACHE_MAX_LENGTH + 1)})
+        saneyaml.dump(test)
+        cache_info = saneyaml.get_cached_style.cache_info()
+        assert 5 == cache_info.misses
+        assert 8 == cache_info.hits
+        assert 5 == cache_info.currsize
+
+    def test_load_file(self):
+        test_file = get_test_loc('yamls/about.yml')
+        with io.open(test_file, encoding='utf-8') as inp:
+            expected = saneyaml.load(inp.read())
+        assert expected == saneyaml.load_file(test_file)
+
+    def test_load_file_optionally_raise_exception_on_dupe(self):
+        with tempfile.TemporaryDirectory() as test_dir:
+            test_file = os.path.join(test_dir, 'dupe.yml')
+            with io.open(test_file, 'w') as out:
+                out.write('a: 1\nb: 2\na: 3\n')
+            assert {'a': '3', 'b': '2'} == saneyaml.load_file(test_file)
+            try:
+                saneyaml.load_file(test_file, allow_duplicate_keys=False)
+                self.fail('Exception not raised')
+            except saneyaml.UnsupportedYamlFeatureError:
+                pass
+
+    def test_dump_file(self):
+        with tempfile.TemporaryDirectory() as test_dir:
+            test_file = os.path.join(test_dir, 'test.yml')
+            test = {'a': ['b', 12], 'é': 'some\nlines\n'}
+            saneyaml.dump_file(test, test_file)
+            with io.open(test_file, 'rb') as inp:
+                assert saneyaml.dump(test, encoding='utf-8') == inp.read()
+
+            os.chmod(test_file, 0o640)
+            saneyaml.dump_file({'a': 'c'}, test_file)
+            with io.open(test_file, encoding='utf-8') as inp:
+                assert 'a: c\n' == inp.read()
+            assert 0o640 == os.stat(test_file).st_mode & 0o777
+            assert ['test.yml'] == os.listdir(test_dir)
+
+    def test_dump_file_does_not_leave_partial_files_on_error(self):
+        with tempfile.TemporaryDirectory() as test_dir:
+            test_file = os.path.join(test_dir, 'test.yml')
+            saneyaml.dump_file({'a': 'b'}, test_file)
+            try:
+                saneyaml.dump_file({'a': object()}, test_file)
+                self.fail('Exception not raised')
+            except yaml.YAMLError:
+                pass
+            assert ['test.yml'] == os.listdir(test_dir)
+            assert {'a': 'b'} == saneyaml.load_file(test_file)
+
+    def test_dump_file_only_if_changed(self):
+        with tempfile.TemporaryDirectory() as test_dir:
+            test_file = os.path.join(test_dir, 'test.yml')
+            test = {'a': ['b', 12], 'é': 'some\nlines\n' * 10000}
+            assert saneyaml.dump_file(test, test_file, only_if_changed=True)
+            os.utime(test_file, ns=(10**18, 10**18))
+
+            assert not saneyaml.dump_file(test, test_file, only_if_changed=True)
+            assert 10**18 == os.stat(test_file).st_mtime_ns
+            with io.open(test_file, 'rb') as inp:
+                assert saneyaml.dump(test, encoding='utf-8') == inp.read()
+
+            test['a'] = ['c', 12]
+            assert saneyaml.dump_file(test, test_file, only_if_changed=True)
+            with io.open(test_file, 'rb') as inp:
+                assert saneyaml.dump(test, encoding='utf-8') == inp.read()
+            assert ['test.yml'] == os.listdir(test_dir)
+
+    def test_load_with_track_changes_records_changes(self):
+        test = 'a: &x\n  - b\n  - c: d\ne: *x\n'
+        result = saneyaml.load(test, track_changes=True)
+        assert isinstance(result, saneyaml.TrackedDict)
+        assert saneyaml.load(test) == result
+        assert result['a'] is result['e']
+        assert not result.changed
+        assert 'a:\n  - b\n  - c: d\ne:\n  - b\n  - c: d\n' == saneyaml.dump(result)
+
+        copied = dict(result['a'][1])
+        copied['f'] = 'g'
+        result.get('x')
+        list(result['a'])
+        assert not result.changed
+
+        result['a'][1].setdefault('f', 'g')
+        assert result.changed
+        assert result['e'][1].changed
+
+        result = saneyaml.load(test, track_changes=True)
+        result['a'].append('h')
+        assert result.changed
+
+        assert 'a' == saneyaml.load('a', track_changes=True)
+        try:
+            saneyaml.load(test, lazy=True, track_changes=True)
+            self.fail('Exception not raised')
+        except ValueError:
+            pass
+
+    def test_dump_file_skips_unchanged_tracked_documents(self):
+        with tempfile.TemporaryDirectory() as test_dir:
+            test_file = os.path.join(test_dir, 'test.yml')
+            other_file = os.path.join(test_dir, 'other.yml')
+            with io.open(test_file, 'w', encoding='utf-8') as out:
+                out.write('a:   [b, c]\n')
+
+            test = saneyaml.load_file(test_file, track_changes=True)
+            assert not saneyaml.dump_file(test, test_file)
+            assert saneyaml.dump_file(test['a'], test_file)
+            with io.open(test_file, encoding='utf-8') as inp:
+                assert '- b\n- c\n' == inp.read()
+
+            with io.open(test_file, encoding='utf-8') as inp:
+                test = saneyaml.load(inp, track_changes=True)
+            assert saneyaml.dump_file(test, other_file)
+            assert not saneyaml.dump_file(test, test_file)
+            test.append('d')
+            assert saneyaml.dump_file(test, test_file)
+            with io.open(test_file, encoding='utf-8') as inp:
+                assert '- b\n- c\n- d\n' == inp.read()
+
+    def test_load_many_returns_results_and_errors_in_order(self):
+        test = ['a: 1', 'a: 1\nb: 2\na: 3\n', 'b: [', '- 2012-03-12'] * 5
+        for workers in (1, 2):
+            results = saneyaml.load_many(
+                test,
+                allow_duplicate_keys=False,
+                workers=workers,
+                chunk_size=3,
+            )
+            assert 20 == len(results)
+            for i in range(0, 20, 4):
+                assert ({'a': '1'}, None) == results[i]
+                obj, error = results[i + 1]
+                assert obj is None
+                assert isinstance(error, saneyaml.UnsupportedYamlFeatureError)
+                obj, error = results[i + 2]
+                assert obj is None
+                assert isinstance(error, yaml.YAMLError)
+                assert (['2012-03-12'], None) == results[i + 3]
+
+    def test_load_many_files(self):
+        test_dir = get_test_loc('yamls')
+        test_files = [
+            os.path.join(test_dir, name)
+            for name in sorted(os.listdir(test_dir))
+            if name.endswith('.yml')
+        ]
+        test_files.append(os.path.join(test_dir, 'does-not-exist.yml'))
+
+        results = saneyaml.load_many(test_files, as_files=True, workers=2, chunk_size=2)
+
+        for test_file, (obj, error) in zip(test_files[:-1], results):
+            assert error is None
+            assert saneyaml.load_file(test_file) == obj
+        obj, error = results[-1]
+        assert isinstance(error, IOError)
+
+    def test_dump_many_returns_yaml_in_order(self):
+        test = [{'a': ['b', i]} for i in range(10)] + [['1.0', None]]
+        expected = [saneyaml.dump(obj, indent=4) for obj in test]
+        for workers in (1, 2):
+            results = saneyaml.dump_many(test, indent=4, workers=workers, chunk_size=3)
+            assert expected == results
+
+    def test_dump_many_files(self):
+        with tempfile.TemporaryDirectory() as test_dir:
+            test = [{'a': ['b', i]} for i in range(10)]
+            locations = [os.path.join(test_dir, '{}.yml'.format(i)) for i in range(10)]
+            saneyaml.dump_many_files(test, locations, workers=2, chunk_size=3)
+            for obj, location in zip(test, locations):
+                with io.open(location, encoding='utf-8') as inp:
+                    assert saneyaml.dump(obj) == inp.read()
+
+    def test_load_aliased_mappings_and_lists_are_the_same_objects(self):
+        test = '''
+a: &list [1, 2]
+b: *list
+c: &map
+  d: e
+f: *map
+'''
+        result = saneyaml.load(test)
+        assert {'a': ['1', '2'], 'b': ['1', '2'], 'c': {'d': 'e'}, 'f': {'d': 'e'}} == result
+        assert result['a'] is result['b']
+        assert result['c'] is result['f']
+
+    def test_load_falls_back_to_pyyaml_constructors_for_unsupported_nodes(self):
+        assert {'a', 'b'} == saneyaml.load('!!set {a, b}')
+        assert {'a': b'hello'} == saneyaml.load('a: !!binary aGVsbG8=')
+        try:
+            saneyaml.load('? [a, b]\n: c\n')
+            self.fail('Exception not raised')
+        except TypeError:
+            pass
+
+    def test_load_reports_duplicate_keys_breadth_first(self):
+        test = '''
+a:
+  b: 1
+  b: 2
+c: 1
+c: 2
+'''
+        try:
+            saneyaml.load(test, allow_duplicate_keys=False)
+            self.fail('Exception not raised')
+        except saneyaml.UnsupportedYamlFeatureError as e:
+            assert 'Duplicate key in YAML source: c' == str(e)
+
+    def test_get_single_data_from_events(self):
+        test = '''
+a: &x [1, yes, null]
+b: *x
+c: !ruby/object {d: !!int 5}
+'''
+        loader = saneyaml.SaneLoader(test)
+        result = loader.get_single_data_from_events()
+        assert {'a': ['1', True, 'null'], 'b': ['1', True, 'null'], 'c': {'d': '5'}} == result
+        assert result['a'] is result['b']
+        assert saneyaml.load(test) == result
+
+    def test_get_single_data_from_events_raise_exception_on_unsupported_events(self):
+        tests = [
+            ('!!set {a, b}', saneyaml.SaneLoader),
+            ('? [a, b]\n: c\n', saneyaml.SaneLoader),
+            ('a: *undefined', saneyaml.SaneLoader),
+            ('a: 1\n---\nb: 2\n', saneyaml.SaneLoader),
+            ('a: 1\na: 2\n', saneyaml.DupeKeySaneLoader),
+        ]
+        for test, loader_class in tests:
+            loader = loader_class(test)
+            try:
+                loader.get_single_data_from_events()
+                self.fail('Exception not raised')
+            except saneyaml.UnsupportedNodeError:
+                pass
+
+    def test_load_raise_the_same_errors_when_not_loading_from_events(self):
+        try:
+            saneyaml.load('a: 1\n---\nb: 2\n')
+            self.fail('Exception not raised')
+        except yaml.composer.ComposerError as e:
+            assert 'expected a single document in the stream' in str(e)
+
+        try:
+            saneyaml.load('a: *undefined')
+            self.fail('Exception not raised')
+        except yaml.composer.ComposerError as e:
+            assert 'found undefined alias' in str(e)
+
+    def test_load_lazy_constructs_values_on_first_access(self):
+        test = '''
+name: foo
+licenses:
+  - key: mit
+    text: |
+      some
+      text
+  - key: &key apache-2.0
+flag: yes
+alias: *key
+'''
+        result = saneyaml.load(test, lazy=True)
+        assert isinstance(result, saneyaml.LazyMapping)
+        assert result.data is None
+        assert 'foo' == result['name']
+        assert result.data is not None
+
+        licenses = result['licenses']
+        assert isinstance(licenses, saneyaml.LazySequence)
+        assert licenses.parsed is None and licenses.data is None
+        assert 'apache-2.0' == licenses[-1]['key']
+        # only the accessed mapping is parsed
+        assert licenses[0].parsed is None and licenses[0].data is None
+        assert licenses[-1].data is not None
+        assert 2 == len(licenses)
+        assert licenses is result['licenses']
+
+        assert saneyaml.load(test) == result
+        assert result == saneyaml.load(test)
+        assert True is result['flag']
+        assert 'apache-2.0' == result['alias']
+        assert 'missing' not in result
+        try:
+            licenses[-3]
+            self.fail('Exception not raised')
+        except IndexError:
+            pass
+        try:
+            result['name'] = 'bar'
+            self.fail('Exception not raised')
+        except TypeError:
+            pass
+
+    def test_load_lazy_parses_mappings_and_lists_from_their_source(self):
+        test = (
+            'a: {b: [c,\n  d], e: &x [f]}\n'
+            'g:\n'
+            '- h: "i\n    j"\n'
+            '  k: *x\n'
+            'l: [ {m: n} , {o: p} ]\n'
+        )
+        expected = saneyaml.load(test)
+        for source in (test, ('\ufeff' + test).encode('utf-8'), io.StringIO(test)):
+            result = saneyaml.load(source, lazy=True)
+            assert isinstance(result['a']['b'], saneyaml.LazySequence)
+            assert expected == result
+            assert saneyaml.dump(expected) == saneyaml.dump(result)
+            assert result['a']['e'] is result['g'][0]['k']
+
+        result = saneyaml.load('a: !!set {b, c}\n', lazy=True)
+        assert {'a': {'b', 'c'}} == result
+        assert not isinstance(result, saneyaml.LazyMapping)
+
+    def test_load_lazy_raise_exception_on_dupe_on_first_access(self):
+        test = '''
+a: 1
+b:
+  c: 1
+  c: 2
+'''
+        result = saneyaml.load(test, allow_duplicate_keys=False, lazy=True)
+        assert '1' == result['a']
+        try:
+            result['b']['c']
+            self.fail('Exception not raised')
+        except saneyaml.UnsupportedYamlFeatureError as e:
+            assert 'Duplicate key in YAML source: c' == str(e)
+
+    def test_load_lazy_falls_back_to_pyyaml_constructors_for_unsupported_nodes(self):
+        result = saneyaml.load('a: !!set {b, c}\nd: [!!binary aGVsbG8=]\n', lazy=True)
+        assert {'b', 'c'} == result['a']
+        assert [b'hello'] == result['d']
+        assert None is saneyaml.load('', lazy=True)
+        assert 'a' == saneyaml.load('a', lazy=True)
+
+    def test_load_with_keys_stops_when_all_keys_are_found(self):
+        test = '''
+key: mit
+other: &o
+  - a
+name: MIT License
+rest: [this is not, valid YAML
+'''
+        result = saneyaml.load(test, keys=('name', 'key'))
+        assert {'key': 'mit', 'name': 'MIT License'} == result
+        assert ['key', 'name'] == list(result)
+
+        try:
+            saneyaml.load(test, keys=('key', 'missing'))
+            self.fail('Exception not raised')
+        except yaml.YAMLError:
+            pass
+
+    def test_load_with_keys_has_same_results_as_load(self):
+        tests = [
+            'a: &x [1]\nb: *x\nc: d\n',
+            '!!set {a, b}',
+            '- a\n- b\n',
+            '',
+            'a: !!binary aGVsbG8=\nb: c\n',
+        ]
+        for test in tests:
+            expected = saneyaml.select_keys(saneyaml.load(test), ['b'])
+            assert expected == saneyaml.load(test, keys=['b'])
+
+        test = 'a: 1\nb: 2\nb: 3\n'
+        assert {'b': '3'} == saneyaml.load(test, keys=['b', 'c'])
+        try:
+            saneyaml.load(test, allow_duplicate_keys=False, keys=['b', 'c'])
+            self.fail('Exception not raised')
+        except saneyaml.UnsupportedYamlFeatureError as e:
+            assert 'Duplicate key in YAML source: b' == str(e)
+
+        # loading stops at the first value of a key when all keys are found
+        # while load returns its last value
+        assert {'b': '2'} == saneyaml.load(test, keys=['b'])
+        assert {'a': '1', 'b': '3'} == saneyaml.load(test)
+
+    def test_load_with_keys_rejects_strings_and_lazy(self):
+        for keys in ('ab', b'ab'):
+            try:
+                saneyaml.load('a: 1\nb: 2\n', keys=keys)
+                self.fail('Exception not raised')
+            except ValueError:
+                pass
+        try:
+            saneyaml.load_file(get_test_loc('yamls/about.yml'), keys='name')
+            self.fail('Exception not raised')
+        except ValueError:
+            pass
+        try:
+            saneyaml.load('a: 1\nb: 2\n', keys=['a'], lazy=True)
+            self.fail('Exception not raised')
+        except ValueError:
+            pass
+
+    def test_load_file_with_keys(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            location = os.path.join(tmp_dir, 'test.yml')
+            with open(location, 'w') as out:
+                out.write('key: mit\nname: MIT\ntext: [\n')
+            assert {'key': 'mit'} == saneyaml.load_file(location, keys=['key'])
+
+            with open(location, 'w') as out:
+                out.write('text: !!binary aGVsbG8=\nkey: mit\n')
+            assert {'key': 'mit'} == saneyaml.load_file(location, keys=['key'])
+
+    def test_cached_loader_returns_cached_objects_until_the_file_changes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            location = os.path.join(tmp_dir, 'test.yml')
+            cache_dir = os.path.join(tmp_dir, 'cache')
+            with open(location, 'w') as out:
+                out.write('a: b\n')
+            # an old mtime that is not racily close to the caching time
+            os.utime(location, ns=(10**18, 10**18))
+
+            loader = saneyaml.CachedLoader(cache_dir)
+            assert {'a': 'b'} == loader.load_file(location)
+            assert {'a': 'b'} == saneyaml.CachedLoader(cache_dir).load_file(location)
+            assert {'a': 'b'} == loader.load_file(location)
+            report = loader.report()
+            assert 1 == report['hits']
+            assert 1 == report['misses']
+            assert 0.5 == report['hit_rate']
+
+            # same size and mtime but a different content
+            with open(location, 'w') as out:
+                out.write('a: c\n')
+            os.utime(location, ns=(10**18, 10**18 + 1))
+            assert {'a': 'c'} == loader.load_file(location)
+
+            # a different mtime but the same content
+            os.utime(location, ns=(10**18, 10**18 + 2))
+            assert {'a': 'c'} == loader.load_file(location)
+            assert 2 == loader.hits
+            assert 2 == loader.misses
+
+            for name in os.listdir(cache_dir):
+                with open(os.path.join(cache_dir, name), 'wb') as out:
+                    out.write(b'corrupted')
+            assert {'a': 'c'} == loader.load_file(location)
+            assert 3 == loader.misses
+
+    def test_cached_loader_evicts_least_recently_used_entries(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_dir = os.path.join(tmp_dir, 'cache')
+            locations = []
+            for i in range(3):
+                location = os.path.join(tmp_dir, '{}.yml'.format(i))
+                with open(location, 'w') as out:
+                    out.write('a: {}\n'.format(i))
+                os.utime(location, ns=(10**18, 10**18))
+                locations.append(location)
+
+            loader = saneyaml.CachedLoader(cache_dir)
+            loader.load_file(locations[0])
+            entry_size = loader.report()['size']
+            loader.max_size = entry_size * 2
+
+            loader.load_file(locations[1])
+            cache_location = loader.get_cache_location(locations[0])
+            os.utime(cache_location, ns=(10**19, 10**19))
+            loader.load_file(locations[2])
+            assert 1 == loader.evictions
+            assert entry_size * 2 == loader.report()['size']
+            assert os.path.exists(cache_location)
+            assert not os.path.exists(loader.get_cache_location(locations[1]))
+
+    def test_build_snapshot_and_open_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            corpus = os.path.join(tmp_dir, 'corpus')
+            os.makedirs(os.path.join(corpus, 'sub'))
+            contents = {
+                'a.yml': 'a: b\n',
+                'sub/c.yml': '- c\n',
+                'sub/d.yml': '',
+                'sub/e.txt': 'not: loaded\n',
+            }
+            for path, content in contents.items():
+                location = os.path.join(corpus, path)
+                with open(location, 'w') as out:
+                    out.write(content)
+                # an old mtime that is not racily close to the build time
+                os.utime(location, ns=(10**18, 10**18))
+
+            location = os.path.join(tmp_dir, 'corpus.snapshot')
+            loaded = saneyaml.build_snapshot(corpus, '*.yml', location)
+            assert ['a.yml', 'sub/c.yml', 'sub/d.yml'] == loaded
+
+            with saneyaml.open_snapshot(location) as snapshot:
+                assert ['a.yml', 'sub/c.yml', 'sub/d.yml'] == list(snapshot)
+                assert not snapshot.objects
+                assert ['c'] == snapshot['sub/c.yml']
+                assert ['sub/c.yml'] == list(snapshot.objects)
+                expected = {'a.yml': {'a': 'b'}, 'sub/c.yml': ['c'], 'sub/d.yml': None}
+                assert expected == dict(snapshot)
+
+            # same size and mtime but a different content
+            with open(os.path.join(corpus, 'a.yml'), 'w') as out:
+                out.write('a: c\n')
+            os.utime(os.path.join(corpus, 'a.yml'), ns=(10**18, 10**18))
+            os.remove(os.path.join(corpus, 'sub', 'd.yml'))
+            with open(os.path.join(corpus, 'f.yml'), 'w') as out:
+                out.write('f: g\n')
+
+            loaded = saneyaml.build_snapshot(corpus, '*.yml', location)
+            assert ['f.yml'] == loaded
+            with saneyaml.open_snapshot(location) as snapshot:
+                assert {'a': 'b'} == snapshot['a.yml']
+
+            os.utime(os.path.join(corpus, 'a.yml'), ns=(10**18, 10**18 + 1))
+            loaded = saneyaml.build_snapshot(corpus, '*.yml', location)
+            assert ['a.yml'] == loaded
+            with saneyaml.open_snapshot(location) as snapshot:
+                expected = {'a.yml': {'a': 'c'}, 'f.yml': {'f': 'g'}, 'sub/c.yml': ['c']}
+                assert expected == dict(snapshot)
+
+    def test_build_snapshot_build_time_is_taken_before_reading_files(self):
+        read_times = []
+        read_file = saneyaml.read_file
+
+        def timed_read_file(location):
+            read_times.append(time.time_ns())
+            return read_file(location)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name in ('a.yml', 'b.yml'):
+                with open(os.path.join(tmp_dir, name), 'w') as out:
+                    out.write('a: b\n')
+            location = os.path.join(tmp_dir, 'corpus.snapshot')
+            saneyaml.read_file = timed_read_file
+            try:
+                saneyaml.build_snapshot(tmp_dir, '*.yml', location)
+            finally:
+                saneyaml.read_file = read_file
+
+            assert 2 == len(read_times)
+            with saneyaml.open_snapshot(location) as snapshot:
+                assert snapshot.built_ns <= min(read_times)
+
+    def test_instrument_reports_load_and_dump_phases(self):
+        stats = []
+        test = 'a: [b, c]\né: &x d\nf: *x\n'
+        with saneyaml.instrument(stats.append):
+            loaded = saneyaml.load(test)
+            dumped = saneyaml.dump(loaded)
+        saneyaml.load(test)
+        saneyaml.dump(loaded)
+
+        assert saneyaml.load(test) == loaded
+        assert saneyaml.dump(loaded) == dumped
+        assert ['load', 'dump'] == [stat['operation'] for stat in stats]
+        load_stats, dump_stats = stats
+
+        assert ['scan', 'parse', 'compose', 'construct'] == list(load_stats['timings'])
+        expected = dict(tokens=21, events=15, scalars=6, mappings=1, sequences=1, aliases=1)
+        assert expected == load_stats['counts']
+        assert len(test.encode('utf-8')) == load_stats['bytes_in']
+        assert 0 == load_stats['bytes_out']
+
+        assert ['represent', 'serialize', 'emit'] == list(dump_stats['timings'])
+        expected = dict(events=15, scalars=7, mappings=1, sequences=1, aliases=0)
+        assert expected == dump_stats['counts']
+        assert 0 == dump_stats['bytes_in']
+        assert len(dumped.encode('utf-8')) == dump_stats['bytes_out']
+        assert not saneyaml.instruments
+
+    def test_validate_reports_all_issues(self):
+        test = '''a: 1
+b:
+  c: &x 1
+  c: !!int 2
+  ? [d]
+  : e
+yes: *x
+true: !ruby/sym f
+a: *y
+g: [&x h, =]
+'''
+        Issue = saneyaml.ValidationIssue
+        expected = [
+            Issue('duplicate-key', 'Duplicate key in YAML source: c', 4, 3),
+            Issue('complex-key', 'Mapping or list used as a key', 5, 5),
+            Issue(
+                'alias',
+                'Alias is loaded as its anchored value and not kept when dumping: *x', 7, 6),
+            Issue('duplicate-key', 'Duplicate key in YAML source: True', 8, 1),
+            Issue('unknown-tag', 'Unknown tag: !ruby/sym', 8, 7),
+            Issue('duplicate-key', 'Duplicate key in YAML source: a', 9, 1),
+            Issue('undefined-alias', 'Undefined alias: *y', 9, 4),
+            Issue('duplicate-anchor', 'Duplicate anchor: &x', 10, 5),
+            Issue('unknown-tag', 'Unknown tag: tag:yaml.org,2002:value', 10, 11),
+        ]
+        assert expected == saneyaml.validate(test)
+        assert [] == saneyaml.validate('a: [b, c]\n---\na: d\n')
+        assert [] == saneyaml.validate('')
+
+    def test_validate_reports_syntax_errors_and_ruby_tags(self):
+        issues = saneyaml.validate('a: b\nc: [d\n')
+        assert 1 == len(issues)
+        assert 'syntax-error' == issues[0].kind
+
+        with open(get_test_loc('ruby_tags/metadata1'), 'rb') as stream:
+            issues = saneyaml.validate(stream)
+        assert issues
+        assert all(issue.kind == 'unknown-tag' for issue in issues)
+        assert ('Unknown tag: !ruby/object:Gem::Specification', 1, 5) == issues[0][1:]
+
+        with open(get_test_loc('ruby_tags/metadata1.notag'), 'rb') as stream:
+            assert [] == saneyaml.validate(stream)
+
+    def test_load_intern_shares_keys_and_short_values(self):
+        long_value = 'x' * 100
+        test = 'a: b\nc:\n  - b\n  - a\n  - {}\nd: {{a: b}}\n'.format(long_value)
+        table = saneyaml.InternTable()
+        first = saneyaml.load(test, intern=table)
+        # a set is loaded with the PyYAML constructors
+        second = saneyaml.load(test + 'e: !!set {b: , f: }\n', intern=table)
+        assert first == saneyaml.load(test)
+        assert 7 == len(table)
+
+        key_a = list(first)[0]
+        assert key_a is first['c'][1]
+        assert key_a is list(first['d'])[0]
+        assert key_a is list(second)[0]
+        assert first['a'] is second['d']['a']
+        assert first['a'] is [value for value in second['e'] if value == 'b'][0]
+        assert first['c'][2] is not second['c'][2]
+
+        docs = list(saneyaml.iter_load(test + '---\n' + test, intern=True))
+        assert list(docs[0])[0] is list(docs[1])[0]
+
+        try:
+            saneyaml.load(test, lazy=True, intern=True)
+            self.fail('Exception not raised')
+        except ValueError:
+            pass
+
+    def test_intern_table_is_bounded(self):
+        table = saneyaml.InternTable(max_size=2, max_length=3)
+        a = table.intern(''.join(['a', 'b']))
+        assert a is table.intern(''.join(['a', 'b']))
+        table.intern('cd')
+        assert 2 == len(table)
+        e = ''.join(['e', 'f'])
+        assert e is table.intern(e)
+        assert e is not table.intern(''.join(['e', 'f']))
+        assert 2 == len(table)
+        long_value = ''.join(['ab', 'cd'])
+        assert long_value is table.intern(long_value)
+        assert 2 == len(table)
+
+    def test_load_share_subtrees_returns_shared_frozen_subtrees(self):
+        test = (
+            'a: [x, y]\n'
+            'b: [x, y]\n'
+            'c: {d: [x, y], e: f}\n'
+            'g: {d: [x, y], e: f}\n'
+            'h: {e: f, d: [x, y]}\n'
+        )
+        result = saneyaml.load(test, share_subtrees=True)
+        assert saneyaml.load(test) == result
+        assert saneyaml.dump(saneyaml.load(test)) == saneyaml.dump(result)
+        assert isinstance(result, saneyaml.FrozenDict)
+        assert isinstance(result['a'], saneyaml.FrozenList)
+        assert result['a'] is result['b'] is result['c']['d']
+        assert result['c'] is result['g']
+        # mappings with keys in a different order are not shared
+        assert result['c'] is not result['h']
+        assert result['c'] == result['h']
+        assert hash(result['c']) == hash(result['h'])
+
+        copied = pickle.loads(pickle.dumps(result))
+        assert result == copied
+        assert copied['a'] is copied['b']
+
+        for modify in (
+            lambda: result.update(a='b'),
+            lambda: result['c'].pop('e'),
+            lambda: result['a'].append('z'),
+        ):
+            try:
+                modify()
+                self.fail('Exception not raised')
+            except TypeError:
+                pass
+
+        try:
+            saneyaml.load('&a [b, *a]\n', share_subtrees=True)
+            self.fail('Exception not raised')
+        except saneyaml.UnsupportedYamlFeatureError:
+            pass
+
+    def test_load_share_subtrees_keeps_the_keys_order_of_nested_mappings(self):
+        test = (
+            'p1:\n'
+            '  x: {a: 1, b: 2}\n'
+            'p2:\n'
+            '  x: {b: 2, a: 1}\n'
+            'l1: [{a: 1, b: 2}]\n'
+            'l2: [{b: 2, a: 1}]\n'
+        )
+        result = saneyaml.load(test, share_subtrees=True)
+        assert saneyaml.dump(saneyaml.load(test)) == saneyaml.dump(result)
+        assert result['p1'] is not result['p2']
+        assert result['l1'] is not result['l2']
+        assert ['a', 'b'] == list(result['p1']['x'])
+        assert ['b', 'a'] == list(result['p2']['x'])
+
+        result = saneyaml.get_shared([[1], [True], [1.0], [1]])
+        assert result[0] is result[3]
+        assert result[0] is not result[1]
+        assert result[0] is not result[2]
+
+    def test_load_records_columnar_returns_record_tables(self):
+        test = (
+            'packages:\n'
+            '  - name: a\n'
+            '    version: 1.0\n'
+            '    deps:\n'
+            '      - {name: x, version: 01}\n'
+            '      - {name: y, version: 02}\n'
+            '  - name: b\n'
+            '    version: 2.0\n'
+            '    deps: []\n'
+            'other: [{a: b}, {c: d}]\n'
+            'single: [{a: b}]\n'
+        )
+        expected = saneyaml.load(test)
+        result = saneyaml.load(test, records='columnar')
+        assert expected == result
+        assert saneyaml.dump(expected) == saneyaml.dump(result)
+
+        packages = result['packages']
+        assert isinstance(packages, saneyaml.RecordTable)
+        assert isinstance(packages[0]['deps'], saneyaml.RecordTable)
+        assert ('a', 'b') == packages.column('name')
+        assert {'name': 'b', 'version': '2.0', 'deps': []} == packages[-1]
+        assert 'version' in packages[0]
+        assert [packages[1]] == packages[1:]
+        # mappings with other keys or lists of a single mapping are not records
+        assert isinstance(result['other'], list)
+        assert isinstance(result['single'], list)
+        assert result == pickle.loads(pickle.dumps(result))
+
+        try:
+            packages[2]
+            self.fail('Exception not raised')
+        except IndexError:
+            pass
+
+        try:
+            saneyaml.load(test, records='rows')
+            self.fail('Exception not raised')
+        except ValueError:
+            pass
+
     def test_is_iso_date(self):
         assert saneyaml.is_iso_date('1994-01-01')
         assert saneyaml.is_iso_date('2004-01-01')
@@ -153,6 +1033,141 @@ that: *environ
         assert saneyaml.is_iso_date('2003-02-29')
         assert saneyaml.is_iso_date('2004-01-35')
 
+    def test_is_c_dumpable(self):
+        assert saneyaml.is_c_dumpable({'a': 'b', 'c': {'d': None, 'e': 12}})
+        assert saneyaml.is_c_dumpable([{'a': 'b'}, ['c', 1.2, True]])
+        assert saneyaml.is_c_dumpable({'a': 'some\nlines\n'})
+        # lists in mappings are not indented by libyaml
+        assert not saneyaml.is_c_dumpable({'a': ['b']})
+        # top level scalars may get an extra document end marker
+        assert not saneyaml.is_c_dumpable('a')
+        # libyaml uses block hints for these literals
+        assert not saneyaml.is_c_dumpable({'a': 'some\nlines'})
+        assert not saneyaml.is_c_dumpable({'a': 'some\nlines\n\n'})
+        assert not saneyaml.is_c_dumpable({'a': ' some\nlines\n'})
+        assert not saneyaml.is_c_dumpable({'a': 'some \nlines\n'})
+        # long texts are folded differently by libyaml
+        assert not saneyaml.is_c_dumpable({'a': 'some words ' * 10})
+        assert not saneyaml.is_c_dumpable({'': 'b'})
+        assert not saneyaml.is_c_dumpable({'a': 'tab\t'})
+        assert not saneyaml.is_c_dumpable({'a': object()})
+
+    def test_dump_table_is_the_same_as_dump(self):
+        rows = [
+            {'name': 'a', 'version': '1.0', 'date': '2019-12-12', 'count': 1, 'text': 'x'},
+            {'name': 'b', 'version': '2', 'date': '2019-12-13', 'count': 2, 'text': 'y\nz\n'},
+            {'name': 'c', 'version': '012', 'date': None, 'count': 3, 'text': True},
+        ]
+        assert saneyaml.dump(rows) == saneyaml.dump_table(rows)
+        assert saneyaml.dump(rows[:1]) == saneyaml.dump_table(iter(rows[:1]))
+        assert saneyaml.dump([]) == saneyaml.dump_table([])
+
+        expected = saneyaml.dump([{'date': row['date'], 'name': row['name']} for row in rows])
+        assert expected == saneyaml.dump_table(rows, columns=['date', 'name'])
+
+        nested = [{'a': [1, {'b': 'c'}], 1: {'d': '1.0'}}, {'a': [], 1: {}}]
+        assert saneyaml.dump(nested) == saneyaml.dump_table(nested)
+
+        try:
+            saneyaml.dump_table(rows, columns=['name', 'other'])
+            self.fail('Exception not raised')
+        except KeyError:
+            pass
+
+    def test_table_column_styles(self):
+        column = saneyaml.TableColumn('version', ['1.0', '2.0', '1.0', None])
+        assert "'" == column.style
+        assert {'1.0': "'", '2.0': "'"} == column.styles
+        assert {None} == column.others
+        assert not column.nested
+
+        column = saneyaml.TableColumn('version', ['1.0', 'a', ['b']])
+        assert saneyaml.MIXED_STYLES is column.style
+        assert column.nested
+
+    @skipIf(not saneyaml.CSaneDumper, 'libyaml is not available')
+    def test_dump_table_uses_c_dumper_with_same_output(self):
+        rows = [{'name': 'saneyaml', 'version': '1.0', 'zeros': '012'}] * 3
+        assert saneyaml.is_c_dumpable(saneyaml.Table(rows))
+        assert python_dump(rows) == saneyaml.dump_table(rows)
+        assert not saneyaml.is_c_dumpable(saneyaml.Table([{'a': ['b']}]))
+
+    @skipIf(not saneyaml.CSaneDumper, 'libyaml is not available')
+    def test_dump_uses_c_dumper_with_same_output(self):
+        test = {
+            'name': 'saneyaml',
+            'version': '1.0',
+            'count': 12,
+            'date': '2019-12-12',
+            'zeros': '012',
+            'empty': None,
+            'flag': False,
+            'nested': {'text': 'some\nlines\n', 'null': 'null'},
+        }
+        expected = (
+            "name: saneyaml\n"
+            "version: '1.0'\n"
+            "count: 12\n"
+            "date: '2019-12-12'\n"
+            "zeros: '012'\n"
+            "empty:\n"
+            "flag: no\n"
+            "nested:\n"
+            "  text: |\n"
+            "    some\n"
+            "    lines\n"
+            "  'null': 'null'\n"
+        )
+        assert saneyaml.is_c_dumpable(test)
+        assert expected == saneyaml.dump(test)
+        assert expected == python_dump(test)
+        assert expected.encode('utf-8') == saneyaml.dump(test, encoding='utf-8')
+
+    def test_dump_with_non_utf8_encoding(self):
+        test = {'name': 'caf\xe9'}
+        assert b'name: caf\xe9\n' == saneyaml.dump(test, encoding='latin-1')
+        assert b'name: caf\xe9\n' == saneyaml.dump(test, encoding='cp1252')
+        assert b'- name: caf\xe9\n' == saneyaml.dump_table([test], encoding='latin-1')
+        assert b'name: caf\xc3\xa9\n' == saneyaml.dump(test, encoding='UTF8')
+        try:
+            saneyaml.dump(test, encoding='ascii')
+            self.fail('Exception not raised')
+        except UnicodeEncodeError:
+            pass
+
+    def test_dump_does_not_escape_characters_above_the_bmp(self):
+        test = {'\U0001F600': 'a \U0001F600', 'text': 'some\n\U0001F600\n'}
+        expected = (
+            "\U0001F600: a \U0001F600\n"
+            "text: |\n"
+            "  some\n"
+            "  \U0001F600\n"
+        )
+        assert not saneyaml.is_c_dumpable(test)
+        assert expected == saneyaml.dump(test)
+        assert expected == python_dump(test)
+        assert saneyaml.dump([test]) == saneyaml.dump_table([test])
+
+
+def python_dump(obj, dumper=saneyaml.SaneDumper):
+    """
+    Return a YAML string for `obj` using the `dumper` Dumper class and the same
+    options as saneyaml.dump.
+    """
+    return yaml.dump(
+        data=obj,
+        Dumper=dumper,
+        default_flow_style=False,
+        default_style=None,
+        canonical=False,
+        allow_unicode=True,
+        indent=2,
+        width=saneyaml.WIDTH,
+        line_break='\n',
+        explicit_start=False,
+        explicit_end=False,
+    )
+
 
 safe_chars = re.compile(r'[\W_]', re.MULTILINE)
 
@@ -192,6 +1207,11 @@ def get_yaml_test_method(test_file, expected_load_file, expected_dump_file, rege
         assert expected_load == test_load
         assert expected_dump == test_dump
 
+        with io.open(test_file, encoding='utf-8') as inp:
+            test_lazy_load = saneyaml.load(inp.read(), lazy=True)
+        assert expected_load == test_lazy_load
+        assert expected_dump == saneyaml.dump(test_lazy_load)
+
     tfn = test_file.replace(test_data_dir, '').strip('/\\')
     test_name = 'test_{}'.format(tfn)
     test_name = python_safe(test_name)
@@ -229,3 +1249,99 @@ class TestDataDriven(TestCase):
 
 
 build_tests(cls=TestDataDriven, test_subdir='yamls', regen=False)
+
+
+def get_c_dumper_parity_test_method(test_file):
+    """
+    Build and return a test function checking that the C and Python dumpers
+    output are identical for every part of `test_file` that is C-dumpable.
+    """
+
+    def closure_test_function(self):
+        with io.open(test_file, encoding='utf-8') as inp:
+            test_load = saneyaml.load(inp.read())
+
+        documents = [test_load]
+        if isinstance(test_load, dict):
+            documents.extend({k: v} for k, v in test_load.items())
+            documents.append(list(test_load.values()))
+
+        for document in documents:
+            if saneyaml.is_c_dumpable(document):
+                expected = python_dump(document)
+                assert expected == python_dump(document, dumper=saneyaml.CSaneDumper)
+                assert expected == saneyaml.dump(document)
+
+    tfn = test_file.replace(test_data_dir, '').strip('/\\')
+    test_name = python_safe('test_c_dumper_parity_{}'.format(tfn))
+    closure_test_function.__name__ = test_name
+    closure_test_function.funcname = test_name
+
+    return closure_test_function, test_name
+
+
+@skipIf(not saneyaml.CSaneDumper, 'libyaml is not available')
+class TestCDumperParity(TestCase):
+    """
+    This test case checks that the libyaml-based CSaneDumper yields the same
+    output as the SaneDumper on the YAML test files.
+    """
+    pass
+
+
+for top, _, files in os.walk(os.path.join(test_data_dir, 'yamls')):
+    for yfile in files:
+        if yfile.endswith('.yml'):
+            method, name = get_c_dumper_parity_test_method(
+                os.path.abspath(os.path.join(top, yfile)))
+            setattr(TestCDumperParity, name, method)
+
+
+def get_instrumented_test_method(test_file):
+    """
+    Build and return a test function checking that instrumented loads and
+    dumps of `test_file` yield the same results as the expected load and dump
+    files.
+    """
+
+    def closure_test_function(self):
+        with io.open(test_file + '.expected.load.json', encoding='utf-8') as inp:
+            expected_load = json.load(inp)
+
+        with io.open(test_file + '.expected.yaml.dump', encoding='utf-8') as inp:
+            expected_dump = inp.read()
+
+        stats = []
+        with saneyaml.instrument(stats.append):
+            test_load = saneyaml.load_file(test_file)
+            test_dump = saneyaml.dump(test_load)
+            stream = io.BytesIO()
+            saneyaml.dump_to(test_load, stream)
+
+        assert expected_load == test_load
+        assert expected_dump == test_dump
+        assert expected_dump.encode('utf-8') == stream.getvalue()
+        assert ['load', 'dump', 'dump'] == [stat['operation'] for stat in stats]
+
+    tfn = test_file.replace(test_data_dir, '').strip('/\\')
+    test_name = python_safe('test_instrumented_{}'.format(tfn))
+    closure_test_function.__name__ = test_name
+    closure_test_function.funcname = test_name
+
+    return closure_test_function, test_name
+
+
+class TestInstrumented(TestCase):
+    """
+    This test case checks that instrumented loads and dumps of the YAML test
+    files yield the same results as when not instrumented.
+    """
+    pass
+
+
+for top, _, files in os.walk(os.path.join(test_data_dir, 'yamls')):
+    for yfile in files:
+        if yfile.endswith('.yml'):
+            method, name = get_instrumented_test_method(
+                os.path.abspath(os.path.join(top, yfile)))
+            setattr(TestInstrumented, name, method)